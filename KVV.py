@@ -1,24 +1,174 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
+import random
+from threading import Lock
+import time
+from typing import Callable, Literal
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from log import logger
+from response_cache import CacheEntry, CacheKey, ResponseCache
+from response_capture import ResponseCapture
+
+class CircuitOpenError(Exception):
+    """Raised instead of executing a request while the circuit breaker is open
+    """
+
+class CircuitBreaker:
+    """Class for a circuit breaker that stops calling the API after a number of consecutive failures and then only probes it periodically until it answers again
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        """Creates a closed circuit breaker
+
+        Args:
+            failure_threshold (int, optional): Number of consecutive failed requests after which the circuit opens. Defaults to 5.
+            reset_timeout (float, optional): Seconds after which an open circuit lets one probe request through. Defaults to 60.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        
+        self.state: Literal["closed", "open", "half-open"] = "closed"
+        self.consecutive_failures = 0
+        self._opened = 0.0
+        self._lock = Lock()
+    
+    def allow_request(self) -> bool:
+        """Returns whether a request may be executed right now. If the reset timeout of an open circuit has passed, this lets exactly one probe request through.
+
+        Returns:
+            bool: True, if the request may be executed
+        """
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened >= self.reset_timeout:
+                self.state = "half-open"
+                return True
+            return False
+    
+    def record_success(self):
+        """Closes the circuit after a successful request
+        """
+        with self._lock:
+            if self.state != "closed":
+                logger.warning("API is answering again, closing circuit breaker")
+            self.state = "closed"
+            self.consecutive_failures = 0
+    
+    def record_failure(self):
+        """Counts a failed request and opens the circuit if the threshold is reached or the probe request failed
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half-open" or (self.state == "closed" and self.consecutive_failures >= self.failure_threshold):
+                if self.state == "closed":
+                    logger.error(f"{self.consecutive_failures} consecutive requests failed, opening circuit breaker for {self.reset_timeout} s")
+                self.state = "open"
+                self._opened = time.monotonic()
 
 class KVV:
     """This Class handles everything to do with the KVV Trias API
     """
-    def __init__(self, url: str, requestor_ref: str, user_agent: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"):
+    def __init__(self,
+                 url: str,
+                 requestor_ref: str,
+                 user_agent: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+                 pool_size: int = 4,
+                 timeout: tuple[float, float] = (5, 10),
+                 max_in_flight: int = 4,
+                 capture: ResponseCapture | None = None,
+                 cache: ResponseCache | None = None,
+                 retries: int = 2,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8,
+                 circuit_breaker: "CircuitBreaker | None" = None):
         """Creates an instance for API requests an sets static settings
 
         Args:
             url (str): The URL given to you for API access
             requestor_ref (str): The RequestorRef given to you for API Access
             user_agent (str, optional): The user agent used to make the requests. Defaults to "Mozilla/5.0 (Windows NT 10.0; Win64; x64)".
+            pool_size (int, optional): Maximum number of connections kept open to the API. Defaults to 4.
+            timeout (tuple[float, float], optional): (connect, read) timeout of a request in seconds. Defaults to (5, 10).
+            max_in_flight (int, optional): Maximum number of requests executed at the same time (see submit). Defaults to 4.
+            capture (ResponseCapture | None, optional): Facility to capture all responses to disk with, None to not capture them. Defaults to None.
+            cache (ResponseCache | None, optional): Cache to answer requests from, None to always execute them. Defaults to None.
+            retries (int, optional): Number of times a failed request is retried. Defaults to 2.
+            backoff_base (float, optional): Seconds waited before the first retry, doubled for every further one. Defaults to 0.5.
+            backoff_max (float, optional): Maximum seconds waited before a retry. Defaults to 8.
+            circuit_breaker (CircuitBreaker | None, optional): Circuit breaker that stops requests while the API is down, None for one with default settings. Defaults to None.
         """
         
         # set static variables
         self.url = url
         self.requestor_ref = requestor_ref
         self.user_agent = user_agent
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.capture = capture
+        self.cache = cache
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
         self.headers = {'Content-Type': 'text/xml; charset=utf-8', 
-                'User-Agent': f'{self.user_agent}'}
+                'User-Agent': f'{self.user_agent}',
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive'}
+        
+        # create one session for all requests, so that its connections are kept alive and reused instead of doing a new TCP + TLS handshake for every request
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, max_in_flight))
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers.update(self.headers)
+        
+        # thread pool for executing several requests at the same time
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="KVV")
+        
+        # keys of the cached responses currently being refreshed in the background
+        self._revalidating_lock = Lock()
+        self._revalidating: set[CacheKey] = set()
+        # functions called with the StopPointRef of every cached response refreshed in the background, see add_revalidation_consumer
+        self._revalidation_consumers: list[Callable[[str], None]] = []
+        
+        # statistics about the requests made
+        self._statistics_lock = Lock()
+        self.requests_made = 0
+        self.latencies: deque[float] = deque(maxlen=100)
+    
+    def add_revalidation_consumer(self, consumer: Callable[[str], None]):
+        """Adds a function that is called whenever a stale cached response was refreshed in the background, so that the fresh response can be requested (and answered from the cache) right away
+
+        Args:
+            consumer (Callable[[str], None]): The function, called with the StopPointRef of the refreshed response from a background thread
+        """
+        self._revalidation_consumers.append(consumer)
+    
+    @property
+    def connections_opened(self) -> int:
+        """Number of connections (and with that TCP + TLS handshakes) opened to the API so far
+        """
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+    
+    @property
+    def handshakes_avoided(self) -> int:
+        """Number of requests that reused an already open connection instead of opening a new one
+        """
+        return max(self.requests_made - self.connections_opened, 0)
+    
+    @property
+    def average_latency(self) -> float | None:
+        """Average latency of the last (up to 100) requests in seconds, None if no request has been made yet
+        """
+        with self._statistics_lock:
+            if len(self.latencies) == 0:
+                return None
+            return sum(self.latencies) / len(self.latencies)
         
     def _get_formatted_xml_string(self, request_timestamp: datetime, stop_point_ref: str, time_delta: timedelta, number_of_results) -> str:
         """Returns a formatted xml string that can then be sent to the API
@@ -65,17 +215,85 @@ class KVV:
             stop_point_ref,
             number_of_results: int,
             time_delta: timedelta = timedelta(minutes=3),
-            ) -> requests.Response:
-        """Exeecute an API request to the KVV Trias API
+            ) -> bytes:
+        """Get the departures of a stop point, from the cache if it has a usable response or else by executing an API request to the KVV Trias API
 
         Args:
             stop_point_ref (_type_): StopPoint to request departures for
             number_of_results (int): Number of results to request
             time_delta (timedelta, optional): Timedelta between now and when the departures start to be shown (aka walk time to station). Defaults to timedelta(minutes=3).
-            request_timestamp (datetime, optional): Timestamp of the request. Defaults to datetime.now().
 
         Returns:
-            requests.Response: _description_
+            bytes: The raw (still utf-8 encoded) API response
+        """
+        
+        if self.cache is None:
+            return self._request(stop_point_ref, number_of_results, time_delta)
+        
+        key = (stop_point_ref, number_of_results, time_delta)
+        entry, stale = self.cache.lookup(key)
+        
+        # refresh stale responses in the background, but still answer with them right away
+        if stale:
+            self._revalidate(key)
+        if entry is not None:
+            return entry.response
+        
+        return self._request_and_cache(key)
+    
+    def _request_and_cache(self, key: CacheKey) -> bytes:
+        """Execute an API request and store its response in the cache
+
+        Args:
+            key (CacheKey): (stop_point_ref, number_of_results, time_delta) of the request
+
+        Returns:
+            bytes: The raw (still utf-8 encoded) API response
+        """
+        response = self._request(*key)
+        self.cache.store(key, CacheEntry(response=response, fetched=time.time()))
+        return response
+    
+    def _revalidate(self, key: CacheKey):
+        """Refresh a cached response in the background, unless it already is being refreshed
+
+        Args:
+            key (CacheKey): (stop_point_ref, number_of_results, time_delta) of the request
+        """
+        with self._revalidating_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        
+        def revalidate():
+            try:
+                self._request_and_cache(key)
+            except Exception:
+                logger.exception(f"Cached response of stop point {key[0]} could not be refreshed")
+                return
+            finally:
+                with self._revalidating_lock:
+                    self._revalidating.discard(key)
+            
+            for consumer in self._revalidation_consumers:
+                consumer(key[0])
+        
+        self.executor.submit(revalidate)
+    
+    def _request(self,
+                 stop_point_ref,
+                 number_of_results: int,
+                 time_delta: timedelta,
+                 ) -> bytes:
+        """Exeecute an API request to the KVV Trias API
+
+        Args:
+            stop_point_ref (_type_): StopPoint to request departures for
+            number_of_results (int): Number of results to request
+            time_delta (timedelta): Timedelta between now and when the departures start to be shown (aka walk time to station)
+
+        Returns:
+            bytes: The raw (still utf-8 encoded) API response
         """
         
         request_timestamp = datetime.now()
@@ -83,12 +301,79 @@ class KVV:
         # Get formatted xml string
         xml_body = self._get_formatted_xml_string(request_timestamp, stop_point_ref, time_delta, number_of_results)
         
-        # Save response
-        response = requests.post(self.url, headers=self.headers, data=xml_body).content.decode("utf-8")
+        # Don't even try while the API is known to be down
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError(f"Circuit breaker is open, not requesting stop point {stop_point_ref}")
+        
+        for attempt in range(self.retries + 1):
+            try:
+                # Save response
+                start = time.perf_counter()
+                http_response = self.session.post(self.url, data=xml_body, timeout=self.timeout)
+                latency = time.perf_counter() - start
+                
+                # Update statistics
+                with self._statistics_lock:
+                    self.requests_made += 1
+                    self.latencies.append(latency)
+                
+                http_response.raise_for_status()
+                response = http_response.content
+                break
+            except requests.RequestException as e:
+                # client errors won't go away by retrying and don't mean that the API is down
+                if isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code < 500:
+                    self.circuit_breaker.record_success()
+                    raise
+                if attempt == self.retries:
+                    self.circuit_breaker.record_failure()
+                    raise
+                
+                # wait exponentially longer before every retry, randomized so that concurrent requests don't retry all at once
+                backoff = min(self.backoff_base * 2 ** attempt, self.backoff_max) * random.uniform(0.5, 1.5)
+                logger.warning(f"Request for stop point {stop_point_ref} failed ({e}), retrying in {backoff:.1f} s")
+                time.sleep(backoff)
+        
+        self.circuit_breaker.record_success()
         
-        # Also write it to the disk for backup or debugging
-        with open("response.xml", "w") as f:
-            f.write(response)
+        # Also write it to the disk for backup or debugging, if configured
+        if self.capture is not None:
+            self.capture.capture(stop_point_ref, response)
 
         # Return the response
-        return response
\ No newline at end of file
+        return response
+    
+    def submit(self,
+               stop_point_ref: str,
+               number_of_results: int,
+               time_delta: timedelta = timedelta(minutes=3),
+               ) -> Future:
+        """Starts getting the departures of a stop point in the background (see get). The executor makes sure that no more than max_in_flight requests are running at the same time.
+
+        Args:
+            stop_point_ref (str): StopPoint to request departures for
+            number_of_results (int): Number of results to request
+            time_delta (timedelta, optional): Timedelta between now and when the departures start to be shown (aka walk time to station). Defaults to timedelta(minutes=3).
+
+        Returns:
+            Future: The request, see get_response for its result
+        """
+        return self.executor.submit(self.get, stop_point_ref, number_of_results, time_delta)
+    
+    def get_response(self, stop_point_ref: str, future: Future) -> bytes | None:
+        """Returns the result of a finished request started with submit, logging why if it failed
+
+        Args:
+            stop_point_ref (str): StopPoint the departures were requested for
+            future (Future): The finished request
+
+        Returns:
+            bytes | None: The raw (still utf-8 encoded) API response, None if the request failed
+        """
+        if isinstance(future.exception(), CircuitOpenError):
+            logger.warning(f"Circuit breaker is open, skipping stop point {stop_point_ref} for this refresh")
+        elif future.exception() is not None:
+            logger.error(f"Request for stop point {stop_point_ref} failed, skipping it for this refresh", exc_info=future.exception())
+        else:
+            return future.result()
+        return None
@@ -0,0 +1,33 @@
+"""Compares the wall time of fetching all stop points one after another with fetching them at the same time
+
+Run from the repository root: python -m benchmarks.bench_concurrent_fetch
+"""
+from concurrent.futures import wait
+import time
+
+from benchmarks.stub_trias_server import StubTriasServer
+from KVV import KVV
+
+STOP_POINT_REFS = [f"de:08212:{i}" for i in range(7)]
+DELAY = 0.2
+
+if __name__ == "__main__":
+    server = StubTriasServer(delay=DELAY).start()
+    kvv = KVV(server.url, "REQUESTORREF", max_in_flight=len(STOP_POINT_REFS))
+
+    start = time.perf_counter()
+    for stop_point_ref in STOP_POINT_REFS:
+        kvv.get(stop_point_ref, number_of_results=10)
+    serial = time.perf_counter() - start
+
+    # the way the departure worker requests them
+    start = time.perf_counter()
+    futures = {stop_point_ref: kvv.submit(stop_point_ref, number_of_results=10) for stop_point_ref in STOP_POINT_REFS}
+    wait(futures.values())
+    concurrent = time.perf_counter() - start
+    assert all(kvv.get_response(stop_point_ref, future) is not None for stop_point_ref, future in futures.items())
+
+    print(f"{len(STOP_POINT_REFS)} stop points, {DELAY * 1000:.0f} ms server delay each")
+    print(f"serial:     {serial * 1000:8.1f} ms")
+    print(f"concurrent: {concurrent * 1000:8.1f} ms")
+    server.shutdown()
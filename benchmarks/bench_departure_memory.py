@@ -0,0 +1,61 @@
+"""Compares the memory taken up by 10,000 departures as regular dataclasses with their own copy of every parsed string (as before) and as slotted departures with interned strings
+
+Run from the repository root: python -m benchmarks.bench_departure_memory
+"""
+import gc
+import sys
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from benchmarks import legacy
+from benchmarks.trias_samples import stop_event_response
+from data_classes import Departure, Station, StopPoint
+from helper_functions import get_departures_from_xml
+from line_colors import LineColors
+from station_index import StationIndex
+
+STOP_POINT = StopPoint("de:08212:3", None, None)
+STATIONS = [Station("Durlacher Tor / KIT-Campus Süd", [STOP_POINT])]
+NUMBER_OF_RESPONSES = 10
+RESULTS_PER_RESPONSE = 1000
+
+
+def retained_memory(function) -> tuple[int, list]:
+    """Returns the memory still allocated after the function returned, i.e. taken up by its result"""
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, result
+
+
+if __name__ == "__main__":
+    line_colors = LineColors("line-colors.csv", ("#006EFF", "#FFFFFF"), True)
+    responses = [stop_event_response(RESULTS_PER_RESPONSE, seed=seed) for seed in range(NUMBER_OF_RESPONSES)]
+
+    def dataclass_departures():
+        # the DOM parser hands out a new string for every text, just like the old departures kept them
+        departures = []
+        for response in responses:
+            for departure in legacy.get_departures_from_xml(STOP_POINT.stop_point_ref, ET.ElementTree(ET.fromstring(response.decode("utf-8"))), STATIONS, line_colors):
+                departures.append(legacy.Departure_Dataclass(departure.line_number, departure.destination, departure.platform, departure.station, departure.stop_point,
+                                                             departure.mode, departure.background_color, departure.text_color, departure.planned_time, departure.estimated_time))
+        return departures
+
+    def slotted_departures():
+        station_index = StationIndex(STATIONS)
+        departures = []
+        for response in responses:
+            departures.extend(get_departures_from_xml(STOP_POINT.stop_point_ref, response, station_index, line_colors))
+        return departures
+
+    dataclass_bytes, old = retained_memory(dataclass_departures)
+    slotted_bytes, new = retained_memory(slotted_departures)
+    assert len(old) == len(new) == NUMBER_OF_RESPONSES * RESULTS_PER_RESPONSE
+
+    print(f"{len(new)} departures")
+    print(f"dataclass:           {dataclass_bytes / 1024:8.1f} KiB ({sys.getsizeof(old[0]) + sys.getsizeof(old[0].__dict__)} bytes per object without its fields)")
+    print(f"slotted + interned:  {slotted_bytes / 1024:8.1f} KiB ({sys.getsizeof(new[0])} bytes per object without its fields, {(1 - slotted_bytes / dataclass_bytes) * 100:.0f} % less in total)")
+    print(f"distinct departures: {len(set(new))} (hashable, so duplicates can be dropped with a set)")
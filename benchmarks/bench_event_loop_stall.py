@@ -0,0 +1,77 @@
+"""Measures the maximum Tk event loop stall while refreshing departures on the Tk thread (as before) and in the background worker
+
+Needs a display (e.g. run it with xvfb-run). Run from the repository root: python -m benchmarks.bench_event_loop_stall
+"""
+import time
+import tkinter as tk
+import xml.etree.ElementTree as ET
+
+from benchmarks.legacy import get_departures_from_xml
+from benchmarks.stub_trias_server import StubTriasServer
+from data_classes import Station, StopPoint
+from departure_worker import DepartureWorker
+from KVV import KVV
+from line_colors import LineColors
+from refresh_scheduler import RefreshScheduler
+from station_index import StationIndex
+
+STOP_POINTS = [StopPoint(f"de:08212:{i}", None, None) for i in range(7)]
+STATIONS = [Station("Station", STOP_POINTS)]
+DURATION = 5000
+REFRESH_INTERVAL = 1000
+
+
+class EventLoopMonitor:
+    """Measures how late scheduled Tk callbacks are run, i.e. how long the event loop is stalled"""
+
+    def __init__(self, widget: tk.Misc, interval: int = 10):
+        self.widget = widget
+        self.interval = interval
+        # maximum stall in seconds
+        self.max_stall = 0.0
+        self._expected = time.perf_counter() + interval / 1000
+        widget.after(interval, self._measure)
+
+    def _measure(self):
+        now = time.perf_counter()
+        self.max_stall = max(self.max_stall, now - self._expected)
+        self._expected = now + self.interval / 1000
+        self.widget.after(self.interval, self._measure)
+
+def measure(refresh_on_tk_thread: bool) -> float:
+    root = tk.Tk()
+    root.withdraw()
+    monitor = EventLoopMonitor(root)
+
+    if refresh_on_tk_thread:
+        # the refresh cycle as it used to be: request and parse everything inside a Tk callback
+        def refresh():
+            for stop_point in STOP_POINTS:
+                response = kvv.get(stop_point.stop_point_ref, number_of_results=NUMBER_OF_RESULTS)
+                get_departures_from_xml(stop_point.stop_point_ref, ET.ElementTree(ET.fromstring(response.decode("utf-8"))), STATIONS, line_colors)
+            root.after(REFRESH_INTERVAL, refresh)
+    else:
+        scheduler = RefreshScheduler(min_interval=REFRESH_INTERVAL / 1000, max_interval=REFRESH_INTERVAL / 1000, jitter=0)
+        worker = DepartureWorker(kvv, STOP_POINTS, StationIndex(STATIONS), line_colors, scheduler, number_of_results=NUMBER_OF_RESULTS)
+        worker.start()
+
+        def refresh():
+            worker.get_latest_result()
+            root.after(100, refresh)
+
+    refresh()
+    root.after(DURATION, root.quit)
+    root.mainloop()
+    root.destroy()
+    return monitor.max_stall
+
+
+if __name__ == "__main__":
+    NUMBER_OF_RESULTS = 40
+    server = StubTriasServer(number_of_results=NUMBER_OF_RESULTS, delay=0.05).start()
+    kvv = KVV(server.url, "REQUESTORREF", max_in_flight=len(STOP_POINTS))
+    line_colors = LineColors("line-colors.csv", ("#006EFF", "#FFFFFF"), False)
+
+    print(f"maximum stall, refresh on Tk thread:     {measure(True) * 1000:8.1f} ms")
+    print(f"maximum stall, refresh in worker thread: {measure(False) * 1000:8.1f} ms")
+    server.shutdown()
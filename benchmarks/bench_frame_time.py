@@ -0,0 +1,56 @@
+"""Measures how long the headless backend takes to render the parts of a frame of a window with 10 departure entries and a QR-Code, and to save it as PNG, at several window sizes, and how long a tick takes that only changes the clock, with and without saving the frame (see render -> save_interval). Needs no display.
+
+Run from the repository root: python -m benchmarks.bench_frame_time
+"""
+from datetime import datetime, timedelta
+import os
+from types import SimpleNamespace
+import tempfile
+import time
+import timeit
+
+from data_classes import Departure, Station, StopPoint
+from gui_headless import HeadlessWindow
+from gui_line_icons import LineIcons
+from gui_qr_code import QRCodes
+
+COLORS = {
+    "header_background": "#000000",
+    "header_text": "#FFFFFF",
+    "departure_entry_lighter": "#333333",
+    "departure_entry_darker": "#222222",
+    "departure_entry_text": "#FFFFFF",
+    "qr_code_background": "#FFFFFF",
+    "qr_code_foregreound": "#000000",
+}
+CONFIG = SimpleNamespace(colors=COLORS, general={"time_zone": "Europe/Berlin", "QR-Code-content": "https://github.com/Irgendwer008/KVV-Abfahrtsmonitor", "QR-Code-height": 0.9})
+SIZES = [(800, 480), (1280, 720), (1920, 1080), (3840, 2160)]
+
+
+if __name__ == "__main__":
+    stop_point = StopPoint("de:08212:1", "Gleis", None)
+    station = Station("Station", [stop_point])
+    now = datetime.now().astimezone()
+    modes = ["rail", "tram", "bus", "unknown"]
+    departures = [Departure(f"S{i % 8 + 1}", f"Ziel {i}", str(i % 4 + 1), station, stop_point, modes[i % 4], "#00A76D", "#FFFFFF", now + timedelta(minutes=5 + 3 * i))
+                  for i in range(12)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        print("window size    first refresh (icons rendered)    render departure entries    render header    save PNG    tick (header + save)    tick (header, save skipped)")
+        for width, height in SIZES:
+            window = HeadlessWindow({"width": width, "height": height}, station, LineIcons(), CONFIG, os.path.join(directory, "window-0.png"))
+            window.create_qr_code(QRCodes())
+
+            start = time.perf_counter()
+            window.refresh(departures)
+            first_time = time.perf_counter() - start
+
+            entries_time = min(timeit.repeat(window.render_departure_entries, number=10, repeat=5)) / 10
+            header_time = min(timeit.repeat(lambda: window.render_header(datetime.now()), number=10, repeat=5)) / 10
+            save_time = min(timeit.repeat(window.save, number=10, repeat=5)) / 10
+            # the departure entries stay the same, so a tick only renders the header again
+            tick_time = min(timeit.repeat(window.tick, number=10, repeat=5)) / 10
+            # with a save interval, a tick that only changes the clock doesn't save the frame
+            window.save_interval = 60
+            skipped_tick_time = min(timeit.repeat(window.tick, number=10, repeat=5)) / 10
+            print(f"{width:5}x{height:<5} {first_time * 1000:29.1f} ms {entries_time * 1000:24.1f} ms {header_time * 1000:13.1f} ms {save_time * 1000:8.1f} ms {tick_time * 1000:20.1f} ms {skipped_tick_time * 1000:27.1f} ms")
@@ -0,0 +1,49 @@
+"""Checks that the KVV client reuses one connection (and with that one TLS handshake) for all requests, against a local stub TRIAS HTTPS server with a throwaway self-signed certificate. Needs the openssl command line tool.
+
+Run from the repository root: python -m benchmarks.bench_kvv_session
+"""
+import os
+import subprocess
+import tempfile
+
+from benchmarks.stub_trias_server import StubTriasServer
+from KVV import KVV
+
+REQUESTS = 50
+
+
+def create_certificate(directory: str) -> tuple[str, str]:
+    """Creates a self-signed certificate for 127.0.0.1 and returns the paths of (certfile, keyfile)"""
+    certfile, keyfile = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                    "-keyout", keyfile, "-out", certfile],
+                   check=True, capture_output=True)
+    return certfile, keyfile
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = create_certificate(directory)
+        server = StubTriasServer(certfile=certfile, keyfile=keyfile).start()
+        kvv = KVV(server.url, "REQUESTORREF")
+        # trust only the throwaway certificate, so the requests really go through TLS (REQUESTS_CA_BUNDLE and proxies from the environment would override it)
+        kvv.session.trust_env = False
+        kvv.session.verify = certfile
+
+        for i in range(REQUESTS):
+            kvv.get(f"de:08212:{i % 7}", number_of_results=10)
+
+        print(f"server url:              {server.url}")
+        print(f"requests made:           {kvv.requests_made}")
+        print(f"connections opened:      {kvv.connections_opened} (server accepted {server.connections_accepted})")
+        print(f"handshakes avoided:      {kvv.handshakes_avoided}")
+        print(f"average latency:         {kvv.average_latency * 1000:.2f} ms")
+
+        assert server.url.startswith("https://")
+        assert server.requests_handled == REQUESTS
+        assert server.connections_accepted == 1, f"{server.connections_accepted} connections accepted, expected 1"
+        assert kvv.connections_opened == 1
+        assert kvv.handshakes_avoided == REQUESTS - 1
+        print("all checks passed")
+        server.shutdown()
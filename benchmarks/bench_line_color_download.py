@@ -0,0 +1,95 @@
+"""Exercises the conditional line color download against a local stub that answers 200, 304 and errors, and compares the bytes transferred with unconditional downloads (as before)
+
+Run from the repository root: python -m benchmarks.bench_line_color_download
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import os
+import tempfile
+import threading
+
+from helper_functions import download_line_color_list
+
+
+class StubLineColorServer(ThreadingHTTPServer):
+    """HTTP server serving line-colors.csv with an ETag and Last-Modified header, honouring conditional requests"""
+    daemon_threads = True
+
+    def __init__(self, data: bytes):
+        super().__init__(("127.0.0.1", 0), StubLineColorHandler)
+        self.data = data
+        # status code answered instead of the data while set, e.g. 500 to simulate an outage
+        self.failure_status: int | None = None
+        self.bytes_sent = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/line-colors.csv"
+
+    def start(self) -> "StubLineColorServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StubLineColorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    last_modified = "Sat, 01 Mar 2025 12:00:00 GMT"
+
+    def do_GET(self):
+        if self.server.failure_status is not None:
+            self.send_response(self.server.failure_status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        etag = '"' + hashlib.sha1(self.server.data).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.server.data)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.end_headers()
+        self.wfile.write(self.server.data)
+        self.server.bytes_sent += len(self.server.data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    with open("line-colors.csv", "rb") as f:
+        data = f.read()
+    server = StubLineColorServer(data).start()
+    filename = os.path.join(tempfile.mkdtemp(), "line-colors.csv")
+
+    def download(expected: str, description: str):
+        result = download_line_color_list(filename, server.url, timeout=5)
+        print(f"{description:42} -> {result:9} ({server.bytes_sent} bytes sent so far)")
+        assert result == expected, result
+
+    download("updated", "first download")
+    download("unchanged", "data unchanged")
+    download("unchanged", "data unchanged")
+
+    server.data = data + b"\n"
+    download("updated", "data changed on the server")
+    assert open(filename, "rb").read() == server.data
+
+    with open(filename, "ab") as f:
+        f.write(b"edited by hand\n")
+    download("updated", "file edited locally, validators ignored")
+
+    server.failure_status = 500
+    download("failed", "server error")
+    assert open(filename, "rb").read() == server.data, "a failed download must keep the previous file"
+    server.failure_status = None
+
+    server.shutdown()
+    server.server_close()
+    download("failed", "server unreachable")
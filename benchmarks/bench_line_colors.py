@@ -0,0 +1,40 @@
+"""Compares line color lookups per second of the LineColors registry against the previous pandas based lookup
+
+Run from the repository root: python -m benchmarks.bench_line_colors
+"""
+import time
+
+from benchmarks.legacy import get_line_color
+from line_colors import LineColors
+
+FILENAME = "line-colors.csv"
+FALLBACK_COLORS = ("#006EFF", "#FFFFFF")
+LINE_NAMES = ["S1", "S5", "2", "NL1", "SEVS5", "ICE 74", "FLX10", "unknown"]
+
+
+def lookups_per_second(lookup, duration: float = 2.0) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        for line_name in LINE_NAMES:
+            lookup(line_name)
+        count += len(LINE_NAMES)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    line_colors = LineColors(FILENAME, FALLBACK_COLORS, True)
+
+    # both implementations have to agree before comparing their speed
+    for line_name in LINE_NAMES:
+        assert line_colors.get(line_name) == get_line_color(line_name, FILENAME, FALLBACK_COLORS, True), line_name
+
+    start = time.perf_counter()
+    line_colors.reload()
+    print(f"LineColors.reload:   {(time.perf_counter() - start) * 1000:10.2f} ms")
+
+    legacy = lookups_per_second(lambda line_name: get_line_color(line_name, FILENAME, FALLBACK_COLORS, True))
+    registry = lookups_per_second(line_colors.get)
+    print(f"pandas lookup:       {legacy:14,.0f} lookups/s")
+    print(f"LineColors.get:      {registry:14,.0f} lookups/s")
+    print(f"speedup:             {registry / legacy:14,.0f}x")
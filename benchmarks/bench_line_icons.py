@@ -0,0 +1,48 @@
+"""Compares cold generation of the icons of all KVV lines in line-colors.csv with the font manager against loading the font for every text draw (as before)
+
+Run from the repository root: python -m benchmarks.bench_line_icons
+"""
+import csv
+import os
+import time
+
+from benchmarks import legacy
+from gui_line_icons import FontManager, LineIcons
+from line_colors import LineColors
+
+FONT_PATHS = ["/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"]
+# font sizes of the departure entries of 400, 1080 and 2160 pixel high windows
+FONT_SIZES = [16, 43, 86]
+
+
+def get_kvv_lines() -> list[tuple[str, str, str, str]]:
+    with open("line-colors.csv", newline="", encoding="utf-8") as f:
+        return [(LineColors.icon_shapes.get(row["shape"], "hexagon"), row["lineName"], row["backgroundColor"], row["textColor"])
+                for row in csv.DictReader(f) if "kvv" in row["shortOperatorName"].lower()]
+
+
+def render_all(icons: LineIcons, lines) -> list:
+    images = []
+    for size in FONT_SIZES:
+        height = int(size * 1.6)
+        for shape, text, icon_color, text_color in lines:
+            images.append(icons._create_icon(shape, height * len(text), height, int(height / 7), int(height / 4), text, icon_color, text_color, ("liberation sans", size)))
+    return images
+
+
+if __name__ == "__main__":
+    font_path = next((path for path in FONT_PATHS if os.path.exists(path)), FONT_PATHS[0])
+    lines = get_kvv_lines()
+
+    start = time.perf_counter()
+    legacy_images = render_all(legacy.LineIcons(fonts=FontManager(font_path)), lines)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    images = render_all(LineIcons(fonts=FontManager(font_path)), lines)
+    manager_time = time.perf_counter() - start
+
+    assert all(a.tobytes() == b.tobytes() for a, b in zip(legacy_images, images))
+    print(f"{len(images)} icons ({len(lines)} KVV lines x {len(FONT_SIZES)} sizes), font {font_path}")
+    print(f"font loaded per draw: {legacy_time * 1000:8.1f} ms")
+    print(f"font manager:         {manager_time * 1000:8.1f} ms ({legacy_time / manager_time:.1f}x)")
@@ -0,0 +1,39 @@
+"""Compares the streaming Trias parser with the previous DOM based parser on recorded responses of 10, 100 and 1,000 results
+
+Run from the repository root: python -m benchmarks.bench_parser
+"""
+from dataclasses import replace
+import timeit
+import xml.etree.ElementTree as ET
+
+from benchmarks import legacy
+from benchmarks.trias_samples import stop_event_response
+from data_classes import Station, StopPoint
+from helper_functions import get_departures_from_xml
+from line_colors import LineColors
+from station_index import StationIndex
+
+STOP_POINT = StopPoint("de:08212:3", None, None)
+STATIONS = [Station("Durlacher Tor / KIT-Campus Süd", [STOP_POINT])]
+
+if __name__ == "__main__":
+    line_colors = LineColors("line-colors.csv", ("#006EFF", "#FFFFFF"), True)
+
+    for number_of_results in [10, 100, 1000]:
+        response = stop_event_response(number_of_results)
+
+        def dom():
+            # the previous parser got the response decoded to a string, just like the API handler returned it back then
+            return legacy.get_departures_from_xml(STOP_POINT.stop_point_ref, ET.ElementTree(ET.fromstring(response.decode("utf-8"))), STATIONS, line_colors)
+
+        def streaming():
+            return get_departures_from_xml(STOP_POINT.stop_point_ref, response, StationIndex(STATIONS), line_colors)
+
+        # the DOM parser never read the journey reference and operating day
+        assert dom() == [replace(departure, journey_ref=None, operating_day=None) for departure in streaming()]
+        assert len(streaming()) == number_of_results
+
+        repeat = max(10000 // number_of_results, 5)
+        dom_time = min(timeit.repeat(dom, number=repeat, repeat=3)) / repeat
+        streaming_time = min(timeit.repeat(streaming, number=repeat, repeat=3)) / repeat
+        print(f"{number_of_results:5} results: DOM {dom_time * 1000:8.2f} ms, streaming {streaming_time * 1000:8.2f} ms ({dom_time / streaming_time:.2f}x)")
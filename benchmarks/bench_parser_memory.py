@@ -0,0 +1,41 @@
+"""Compares the peak memory allocated while turning a large recorded response into departures: decoding it and building a DOM (as before) against streaming the raw bytes
+
+Run from the repository root: python -m benchmarks.bench_parser_memory
+"""
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from benchmarks import legacy
+from benchmarks.trias_samples import stop_event_response
+from data_classes import Station, StopPoint
+from helper_functions import get_departures_from_xml
+from line_colors import LineColors
+from station_index import StationIndex
+
+STOP_POINT = StopPoint("de:08212:3", None, None)
+STATIONS = [Station("Durlacher Tor / KIT-Campus Süd", [STOP_POINT])]
+NUMBER_OF_RESULTS = 1000
+
+
+def peak_memory(function) -> int:
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == "__main__":
+    line_colors = LineColors("line-colors.csv", ("#006EFF", "#FFFFFF"), True)
+    response = stop_event_response(NUMBER_OF_RESULTS)
+
+    def decoded_dom():
+        text = response.decode("utf-8")
+        return legacy.get_departures_from_xml(STOP_POINT.stop_point_ref, ET.ElementTree(ET.fromstring(text)), STATIONS, line_colors)
+
+    def streaming_bytes():
+        return get_departures_from_xml(STOP_POINT.stop_point_ref, response, StationIndex(STATIONS), line_colors)
+
+    print(f"response size:           {len(response) / 1024:10.1f} KiB ({NUMBER_OF_RESULTS} results)")
+    print(f"peak, decode + DOM:      {peak_memory(decoded_dom) / 1024:10.1f} KiB")
+    print(f"peak, streaming bytes:   {peak_memory(streaming_bytes) / 1024:10.1f} KiB")
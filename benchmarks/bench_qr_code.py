@@ -0,0 +1,47 @@
+"""Compares creating the QR-Code images of several windows in memory with a shared QRCodes handler against writing and re-reading a PNG file for every window (as before), and checks the module colors
+
+Run from the repository root: python -m benchmarks.bench_qr_code
+"""
+import os
+import tempfile
+import timeit
+
+from benchmarks import legacy
+from gui_qr_code import QRCodes
+
+CONTENT = "https://github.com/Irgendwer008/KVV-Abfahrtsmonitor"
+BACKGROUND = "#FFFFFF"
+FOREGROUND = "#1A2B3C"
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        tmp_png_file = os.path.join(directory, "QRCode.png")
+
+        # the wrong slicing turned the foreground color into a different one, compare the top left corner of the finder pattern (always a dark module, just inside the quiet zone)
+        matrix_size = len(QRCodes().get_matrix(CONTENT))
+        legacy_image = legacy.create_qr_code_image(matrix_size, CONTENT, BACKGROUND, FOREGROUND, tmp_png_file).convert("RGB")
+        image = QRCodes().get_image(CONTENT, matrix_size, BACKGROUND, FOREGROUND)
+        print(f"foreground color: configured {FOREGROUND}, before #{''.join(f'{c:02X}' for c in legacy_image.getpixel((2, 2)))}, now #{''.join(f'{c:02X}' for c in image.getpixel((2, 2)))}")
+        print()
+
+        print("windows  sizes    PNG file per window    shared in memory (cold)    shared in memory (warm)")
+        for number_of_windows, sizes in [(1, [120]), (4, [120]), (4, [120, 180]), (8, [120, 180, 240, 480])]:
+            window_sizes = [sizes[i % len(sizes)] for i in range(number_of_windows)]
+
+            def create_legacy():
+                return [legacy.create_qr_code_image(size, CONTENT, BACKGROUND, FOREGROUND, tmp_png_file) for size in window_sizes]
+
+            qr_codes = QRCodes()
+
+            def create_shared():
+                return [qr_codes.get_image(CONTENT, size, BACKGROUND, FOREGROUND) for size in window_sizes]
+
+            def create_cold():
+                cold_qr_codes = QRCodes()
+                return [cold_qr_codes.get_image(CONTENT, size, BACKGROUND, FOREGROUND) for size in window_sizes]
+
+            legacy_time = min(timeit.repeat(create_legacy, number=20, repeat=5)) / 20
+            cold_time = min(timeit.repeat(create_cold, number=20, repeat=5)) / 20
+            warm_time = min(timeit.repeat(create_shared, number=20, repeat=5)) / 20
+            print(f"{number_of_windows:7}  {len(sizes):5} {legacy_time * 1000:19.2f} ms {cold_time * 1000:23.2f} ms ({legacy_time / cold_time:.1f}x) {warm_time * 1000:16.4f} ms")
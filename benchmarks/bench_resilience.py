@@ -0,0 +1,60 @@
+"""Shows and checks timeouts, retries and the circuit breaker of the KVV client against a local stub TRIAS server injecting delays and 5xx responses
+
+Run from the repository root: python -m benchmarks.bench_resilience
+"""
+import time
+
+from benchmarks.stub_trias_server import StubTriasServer
+from KVV import KVV, CircuitBreaker, CircuitOpenError
+
+
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 1
+
+
+def attempt(kvv: KVV) -> str:
+    start = time.perf_counter()
+    try:
+        kvv.get("de:08212:3", number_of_results=10)
+        outcome = "ok"
+    except CircuitOpenError:
+        outcome = "circuit open"
+    except Exception as e:
+        outcome = type(e).__name__
+    print(f"  {outcome:20} after {(time.perf_counter() - start) * 1000:7.1f} ms, circuit {kvv.circuit_breaker.state}")
+    return outcome
+
+
+if __name__ == "__main__":
+    server = StubTriasServer().start()
+    kvv = KVV(server.url, "REQUESTORREF", timeout=(0.5, 0.5), retries=2, backoff_base=0.05)
+
+    print("slow server (delay above the read timeout):")
+    server.delay = 1
+    assert attempt(kvv) == "ReadTimeout"
+    server.delay = 0
+
+    # start the outage with a fresh circuit breaker, so that the timeout above doesn't count towards its threshold
+    kvv.circuit_breaker = CircuitBreaker(failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT)
+
+    print(f"outage (503 for every request), circuit opens after {FAILURE_THRESHOLD} failed calls:")
+    server.failure_status = 503
+    handled_before = server.requests_handled
+    for _ in range(FAILURE_THRESHOLD):
+        assert attempt(kvv) == "HTTPError"
+    assert kvv.circuit_breaker.state == "open", kvv.circuit_breaker.state
+    handled_while_open = server.requests_handled
+    for _ in range(2):
+        assert attempt(kvv) == "circuit open"
+    assert server.requests_handled == handled_while_open, "no requests may reach the server while the circuit is open"
+    print(f"  server saw {server.requests_handled - handled_before} requests for {FAILURE_THRESHOLD + 2} calls")
+
+    print("recovery (after the reset timeout the probe request closes the circuit):")
+    server.failure_status = None
+    time.sleep(RESET_TIMEOUT)
+    for _ in range(2):
+        assert attempt(kvv) == "ok"
+    assert kvv.circuit_breaker.state == "closed", kvv.circuit_breaker.state
+    assert server.requests_handled == handled_while_open + 2
+    server.shutdown()
+    print("all checks passed")
@@ -0,0 +1,48 @@
+"""Compares import time (-X importtime) and resident memory of loading the line colors with pandas (as before) and with the stdlib reader and its snapshot
+
+Needs pandas for the comparison, which is no longer a requirement of the display itself. Run from the repository root: python -m benchmarks.bench_startup
+"""
+import re
+import subprocess
+import sys
+
+# the pandas based index the line color registry used to build
+LOAD_LEGACY = """
+import resource, time
+start = time.perf_counter()
+from log import logger
+import pandas as pd
+df = pd.read_csv("line-colors.csv")
+filtered_df = df[df["shortOperatorName"].fillna("").str.lower().apply(lambda name: "kvv" in name)]
+colors = {}
+for line_name, background_color, text_color in zip(filtered_df["lineName"], filtered_df["backgroundColor"], filtered_df["textColor"]):
+    colors.setdefault(str(line_name), (background_color, text_color))
+colors.get("S1")
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+LOAD_SNAPSHOT = """
+import resource, time
+start = time.perf_counter()
+from line_colors import LineColors
+LineColors("line-colors.csv", ("#000000", "#FFFFFF"), False).get("S1")
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def measure(code: str) -> tuple[float, float, float]:
+    """Returns the summed up import time in seconds, the load time in seconds and the peak RSS in MiB of running the code in a new interpreter"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    import_time = sum(int(match) for match in re.findall(r"^import time:\s+(\d+) \|", result.stderr, re.MULTILINE)) / 1e6
+    load_time, max_rss = result.stdout.split()
+    return import_time, float(load_time), int(max_rss) / 1024
+
+
+if __name__ == "__main__":
+    # the first run creates the snapshot, the following ones measure loading it
+    measure(LOAD_SNAPSHOT)
+
+    for description, code in [("pandas (before)", LOAD_LEGACY), ("stdlib + snapshot", LOAD_SNAPSHOT)]:
+        runs = [measure(code) for _ in range(5)]
+        import_time, load_time, max_rss = (min(values) for values in zip(*runs))
+        print(f"{description:18} imports {import_time * 1000:7.1f} ms, first lookup after {load_time * 1000:7.1f} ms, peak RSS {max_rss:6.1f} MiB")
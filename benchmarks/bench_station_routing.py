@@ -0,0 +1,68 @@
+"""Compares routing the departures of 100 stations to 50 windows with the station index against searching all stations and scanning all departures for every window (as before)
+
+Run from the repository root: python -m benchmarks.bench_station_routing
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import timeit
+
+from benchmarks import legacy
+from data_classes import Departure, Station, StopPoint
+from station_index import StationIndex
+
+NUMBER_OF_STATIONS = 100
+STOP_POINTS_PER_STATION = 2
+NUMBER_OF_WINDOWS = 50
+DEPARTURES_PER_STOP_POINT = 10
+
+
+def create_setup() -> tuple[list[Station], list[SimpleNamespace], dict[str, list[tuple[datetime, str]]]]:
+    stations = [Station(f"Station {i}", [StopPoint(f"de:08212:{i}:{j}", "Gleis", None) for j in range(STOP_POINTS_PER_STATION)])
+                for i in range(NUMBER_OF_STATIONS)]
+    # the windows show every other station, only the attribute used for routing is needed
+    windows = [SimpleNamespace(station=stations[2 * i]) for i in range(NUMBER_OF_WINDOWS)]
+
+    # the (time, line) pairs parsed from the response of every stop point
+    now = datetime.now().astimezone()
+    parsed = {stop_point.stop_point_ref: [(now + timedelta(minutes=k), f"S{k % 8 + 1}") for k in range(DEPARTURES_PER_STOP_POINT)]
+              for station in stations for stop_point in station.stop_points}
+    return stations, windows, parsed
+
+
+def create_departures(station: Station, stop_point: StopPoint, parsed: list[tuple[datetime, str]]) -> list[Departure]:
+    return [Departure(line, "Ziel", "1", station, stop_point, "rail", "#00A76D", "#FFFFFF", planned_time) for planned_time, line in parsed]
+
+
+def route_legacy(stations, windows, parsed) -> list[list[Departure]]:
+    all_departures: list[Departure] = []
+    for stop_point_ref, events in parsed.items():
+        station, stop_point = legacy.find_stop_point(stop_point_ref, stations)
+        all_departures.extend(create_departures(station, stop_point, events))
+    return [legacy.get_departures_for_window(window, all_departures) for window in windows]
+
+
+def route_indexed(station_index: StationIndex, windows, parsed) -> list[tuple[Departure, ...]]:
+    departures_by_stop_point: dict[str, list[Departure]] = {}
+    for stop_point_ref, events in parsed.items():
+        station, stop_point = station_index.get_stop_point(stop_point_ref)
+        departures_by_stop_point[stop_point_ref] = create_departures(station, stop_point, events)
+    departures_by_station = StationIndex.bucket_by_station(departures_by_stop_point)
+    return [departures_by_station.get(window.station.name, ()) for window in windows]
+
+
+if __name__ == "__main__":
+    stations, windows, parsed = create_setup()
+    station_index = StationIndex(stations, windows)
+
+    # both have to route the same departures to the same windows
+    assert [len(departures) for departures in route_legacy(stations, windows, parsed)] == [len(departures) for departures in route_indexed(station_index, windows, parsed)]
+
+    number = 20
+    legacy_time = min(timeit.repeat(lambda: route_legacy(stations, windows, parsed), number=number, repeat=5)) / number
+    indexed_time = min(timeit.repeat(lambda: route_indexed(station_index, windows, parsed), number=number, repeat=5)) / number
+    build_time = min(timeit.repeat(lambda: StationIndex(stations, windows), number=number, repeat=5)) / number
+
+    print(f"{NUMBER_OF_STATIONS} stations, {NUMBER_OF_WINDOWS} windows, {NUMBER_OF_STATIONS * STOP_POINTS_PER_STATION * DEPARTURES_PER_STOP_POINT} departures per cycle")
+    print(f"search and scan: {legacy_time * 1000:8.2f} ms per cycle")
+    print(f"station index:   {indexed_time * 1000:8.2f} ms per cycle ({legacy_time / indexed_time:.1f}x)")
+    print(f"building the index once: {build_time * 1000:.3f} ms")
@@ -0,0 +1,57 @@
+"""Compares selecting the next 10 departures of a station with a bounded heap over the merged, already ordered stop point streams against filtering and sorting all of them (as before), for large numbers of results and many stop points per station
+
+Run from the repository root: python -m benchmarks.bench_top_n
+"""
+from datetime import datetime, timedelta
+import random
+import timeit
+from zoneinfo import ZoneInfo
+
+from benchmarks import legacy
+from data_classes import Departure, Station, StopPoint
+from helper_functions import get_next_departures
+from station_index import StationIndex
+
+TIME_ZONE = "Europe/Berlin"
+NUMBER_OF_DEPARTURE_ENTRIES = 10
+
+
+def create_departures_by_stop_point(number_of_stop_points: int, number_of_results: int) -> dict[str, list[Departure]]:
+    rng = random.Random(0)
+    stop_points = [StopPoint(f"de:08212:3:{i}", None, None) for i in range(number_of_stop_points)]
+    station = Station("Station", stop_points)
+    now = datetime.now().replace(tzinfo=ZoneInfo(TIME_ZONE))
+
+    departures_by_stop_point = {}
+    for stop_point in stop_points:
+        # the API sends every stop point's results ordered by time, some of them already passed
+        planned_times = sorted(now + timedelta(seconds=rng.randint(-120, 60 * number_of_results)) for _ in range(number_of_results))
+        departures_by_stop_point[stop_point.stop_point_ref] = [
+            Departure("S1", "Ziel", "1", station, stop_point, "rail", "#00A76D", "#FFFFFF", planned_time, planned_time + timedelta(minutes=rng.randint(0, 2)))
+            for planned_time in planned_times]
+    return departures_by_stop_point
+
+
+if __name__ == "__main__":
+    print("stop points  results  departures    filter + sort  heap over merged streams")
+    for number_of_stop_points in [1, 4, 8]:
+        for number_of_results in [10, 100, 1000]:
+            departures_by_stop_point = create_departures_by_stop_point(number_of_stop_points, number_of_results)
+            # how the departures used to reach the window: all stop points' departures one after another
+            concatenated = [departure for departures in departures_by_stop_point.values() for departure in departures]
+            # how they reach it now: merged into one ordered stream per station by the worker
+            merged = StationIndex.bucket_by_station(departures_by_stop_point)["Station"]
+
+            def select_sorted():
+                return legacy.select_departures(concatenated, TIME_ZONE, NUMBER_OF_DEPARTURE_ENTRIES)
+
+            def select_heap():
+                now = datetime.now().replace(tzinfo=ZoneInfo(TIME_ZONE))
+                return get_next_departures(merged, now, NUMBER_OF_DEPARTURE_ENTRIES)[1]
+
+            assert [departure.effective_time for departure in select_sorted()] == [departure.effective_time for departure in select_heap()]
+
+            number = max(1, 20000 // len(concatenated))
+            sorted_time = min(timeit.repeat(select_sorted, number=number, repeat=5)) / number
+            heap_time = min(timeit.repeat(select_heap, number=number, repeat=5)) / number
+            print(f"{number_of_stop_points:11} {number_of_results:8} {len(concatenated):11} {sorted_time * 1000:13.3f} ms {heap_time * 1000:13.3f} ms ({sorted_time / heap_time:.1f}x)")
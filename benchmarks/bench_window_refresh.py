@@ -0,0 +1,87 @@
+"""Counts the Tk calls per steady state refresh of a 1080p window with 10 departure entries, with the diff based updates against reconfiguring every widget (as before)
+
+Needs a display (e.g. run it with xvfb-run). Run from the repository root: python -m benchmarks.bench_window_refresh
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import time
+import tkinter as tk
+
+from benchmarks import legacy
+from data_classes import Departure, Station, StopPoint
+from gui import DepartureEntry, DisplayTicker, Window
+from gui_line_icons import LineIcons
+
+COLORS = {
+    "header_background": "#000000",
+    "header_text": "#FFFFFF",
+    "departure_entry_lighter": "#333333",
+    "departure_entry_darker": "#222222",
+    "departure_entry_text": "#FFFFFF",
+    "qr_code_background": "#FFFFFF",
+    "qr_code_foregreound": "#000000",
+}
+CONFIG = SimpleNamespace(colors=COLORS, general={"time_zone": "Europe/Berlin", "QR-Code-content": None, "QR-Code-height": 0})
+WINDOW_CONFIG = {"width": 1920, "height": 1080, "position_x": 0, "position_y": 0}
+REFRESHES = 120
+
+
+class CountingTk:
+    """Wraps the Tcl interpreter of some widgets and counts the calls made through it"""
+
+    def __init__(self, tk_app):
+        self._tk_app = tk_app
+        self.calls = 0
+
+    def call(self, *args):
+        self.calls += 1
+        return self._tk_app.call(*args)
+
+    def globalsetvar(self, *args):
+        self.calls += 1
+        return self._tk_app.globalsetvar(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._tk_app, name)
+
+
+def measure(entry_class: type) -> tuple[float, float]:
+    root = tk.Tk()
+    root.withdraw()
+
+    stop_point = StopPoint("de:08212:1", "Gleis", None)
+    station = Station("Station", [stop_point])
+    window = Window(WINDOW_CONFIG, station, LineIcons(), DisplayTicker(root), CONFIG)
+
+    # route all Tk calls of the departure entries through the counter
+    counter = CountingTk(root.tk)
+    for entry in window.departure_entries[1:]:
+        entry.__class__ = entry_class
+        for widget in [entry.frame, entry.destination_label, entry.platform_label, entry.time_label, entry.line_icon_label]:
+            widget.tk = counter
+        for var in [entry.destination_var, entry.platform_var, entry.time_text_var]:
+            var._tk = counter
+
+    now = datetime.now().astimezone()
+    departures = [Departure(f"S{i % 8 + 1}", f"Ziel {i}", str(i % 4 + 1), station, stop_point, "rail", "#00A76D", "#FFFFFF", now + timedelta(minutes=5 + 3 * i))
+                  for i in range(12)]
+
+    # the first refresh fills the empty window, only the ones after it are steady state
+    window.refresh(list(departures))
+    counter.calls = 0
+    start = time.perf_counter()
+    for _ in range(REFRESHES):
+        window.refresh(list(departures))
+        root.update_idletasks()
+    duration = time.perf_counter() - start
+
+    root.destroy()
+    return counter.calls / REFRESHES, duration / REFRESHES
+
+
+if __name__ == "__main__":
+    legacy_calls, legacy_time = measure(legacy.DepartureEntry)
+    diff_calls, diff_time = measure(DepartureEntry)
+
+    print(f"reconfigure everything: {legacy_calls:6.1f} Tk calls, {legacy_time * 1000:6.2f} ms per refresh")
+    print(f"diff based updates:     {diff_calls:6.1f} Tk calls, {diff_time * 1000:6.2f} ms per refresh")
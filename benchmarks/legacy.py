@@ -0,0 +1,238 @@
+"""Previous implementations of optimized code paths, kept only so the benchmarks can compare against them. Needs pandas, which the display itself no longer requires."""
+from dataclasses import dataclass
+from datetime import datetime
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+from PIL import Image, ImageDraw, ImageFont
+
+import gui
+import gui_line_icons
+from data_classes import Departure, Station, StopPoint
+from helper_functions import format_platform, get_time_from_now
+from line_colors import LineColors
+
+
+@dataclass
+class Departure_Dataclass:
+    """The regular, mutable dataclass departures used to be, with a __dict__ and its own copy of every string"""
+    line_number: str
+    destination: str
+    platform: str
+    station: Station
+    stop_point: StopPoint
+    mode: str
+    background_color: str
+    text_color: str
+    planned_time: datetime
+    estimated_time: datetime | None = None
+
+
+def get_line_color(line_name: str, filename: str, fallback_colors: tuple[str, str], SEV_lines_use_normal_line_icon_colors: bool) -> tuple[str, str]:
+    """The pandas based line color lookup that re-read and re-filtered the csv file for every departure"""
+    if line_name.startswith("ICE") or line_name.startswith("IC"):
+        return ("#EC0016", "#FFFFFF")
+    if line_name.startswith("FLX"):
+        return ("#97d700", "#FFFFFF")
+
+    df = pd.read_csv(filename)
+    filtered_df = df[df['shortOperatorName'].str.contains('kvv', case=False, na=False)]
+    result = filtered_df[filtered_df["lineName"] == line_name]
+
+    try:
+        if result.empty:
+            if SEV_lines_use_normal_line_icon_colors and line_name[0:3] == "SEV":
+                result = filtered_df[filtered_df["lineName"] == line_name[3:]]
+                if result.empty:
+                    raise IndexError("Line name not found")
+            else:
+                raise IndexError("Line name not found")
+        return result["backgroundColor"].array[0], result["textColor"].array[0]
+    except IndexError:
+        return fallback_colors
+
+
+def get_departures_from_xml(stop_point_ref: str,
+                            tree: ET.ElementTree, 
+                            all_stations: list[Station], 
+                            line_colors: LineColors) -> list["Departure"]:
+    """The DOM based parser that ran a descendant search for every field of every StopEventResult"""
+    tree_root = tree.getroot()
+
+    # Define namespaces
+    ns = {
+        'tri': 'http://www.vdv.de/trias',
+        'siri': 'http://www.siri.org.uk/siri'
+    }
+
+    departures: list[Departure] = []
+
+    # find all StopEvents in the xml tree
+    for event_result in tree_root.findall('.//tri:StopEventResult', ns):
+        if event_result.find('.//tri:StopPointRef', ns).text.startswith(stop_point_ref):
+            event = event_result.find('tri:StopEvent', ns)
+            
+            # Get departure times
+            planned_time = datetime.fromisoformat(event.find('.//tri:ServiceDeparture/tri:TimetabledTime', ns).text)
+            try:
+                estimated_time = datetime.fromisoformat(event.find('.//tri:ServiceDeparture/tri:EstimatedTime', ns).text)
+            except Exception:
+                estimated_time = None
+
+            # Get line name and destination
+            published_line_name = event.find('.//tri:PublishedLineName/tri:Text', ns).text
+            # TODO: make not hardcoded
+            if published_line_name.split(" ")[1] == "SEV":
+                line_number = "SEV" + "".join(published_line_name.split(" ")[-1])
+            elif published_line_name.split(" ")[-1] == "InterCityExpress":
+                line_number = "ICE" + "".join(published_line_name.split(" ")[1:2])
+            elif published_line_name.split(" ")[-1] == "InterCity":
+                line_number = "IC" + "".join(published_line_name.split(" ")[1:2])
+            elif published_line_name.split(" ")[-1] == "Flixbus":
+                line_number = "FLX" + "".join(published_line_name.split(" ")[-1])
+            else: 
+                line_number = published_line_name.split(" ")[-1]
+            destination = event.find('.//tri:DestinationText/tri:Text', ns).text
+            
+            # platform
+            try:
+                platform = format_platform(event.find('.//tri:PlannedBay/tri:Text', ns).text)
+            except AttributeError:
+                platform = None
+            
+            # get stop_point
+            for station in all_stations:
+                for stop_point in station.stop_points:
+                    if stop_point.stop_point_ref == stop_point_ref:
+                        departure_station = station
+                        departure_stop_point = stop_point
+            
+            # mode
+            mode = event.find('.//tri:Mode/tri:PtMode', ns).text
+
+            # Get colors from github table
+            background_color, text_color = line_colors.get(line_number)
+
+            # Create Departure
+            departure = Departure(
+                line_number=line_number,
+                destination=destination,
+                platform=platform,
+                station=departure_station,
+                stop_point=departure_stop_point,
+                mode=mode,
+                background_color=background_color,
+                text_color=text_color,
+                planned_time=planned_time,
+                estimated_time=estimated_time
+            )
+
+            # Add departure to list
+            departures.append(departure)
+
+    return departures
+
+
+class LineIcons(gui_line_icons.LineIcons):
+    """The line icon handler that loaded the TrueType font for every text draw and measured the text by drawing it onto a throwaway image"""
+
+    def _draw_text_centered(self, draw, text, font, fill, width=0, height=0):
+        try:
+            pil_font = ImageFont.truetype(self.fonts.path, font[1])
+        except:
+            pil_font = ImageFont.load_default()
+
+        ascent, descent = pil_font.getmetrics()
+        total_height = ascent + descent
+
+        bbox = draw.textbbox((0, 0), text, font=pil_font)
+        text_width = bbox[2] - bbox[0]
+
+        x = (width - text_width) / 2
+        y = (height - total_height) / 2
+
+        draw.text((x, y), text, font=pil_font, fill=fill)
+
+        return text_width, total_height
+
+    def _get_width_and_height(self, width, height, padding, text, font):
+        text_width, text_height = self._draw_text_centered(ImageDraw.Draw(Image.new("RGBA", (width, height), (0, 0, 0, 0))), text, font, "#000000")
+        width = text_width + 2 * padding
+        height = text_height + padding
+
+        width = max(width, int(height * 5/6))
+
+        return int(width), int(height)
+
+
+class DepartureEntry(gui.DepartureEntry):
+    """The departure entry that reconfigured every widget on every refresh, whether its value changed or not"""
+
+    def update(self, row, icon_handler):
+        # empty departure entries used to be cleared with diff based updates already
+        if row.departure is None:
+            return super().update(row, icon_handler)
+        departure = row.departure
+        background = row.background
+
+        self.frame.configure(background=background)
+        self.destination_label.configure(background=background)
+        self.platform_label.configure(background=background)
+        self.time_label.configure(background=background)
+
+        time_shown = departure.planned_time if departure.estimated_time is None else departure.estimated_time
+        seconds = get_time_from_now(time_shown, self.window.config.general["time_zone"]).total_seconds()
+        if seconds < 60:
+            time_str = "Jetzt"
+        elif seconds < 3600:
+            time_str = f"{int(seconds // 60)} min"
+        else:
+            time_str = f"{int(seconds // 3600)} h {int((seconds % 3600) // 60)} min"
+
+        text, icon_width, icon_height, icon_radius = self.get_icon_parameters(departure.line_number)
+        self.line_icon = icon_handler.get_icon(departure.mode, icon_width, icon_height, icon_radius, text, departure.background_color, departure.text_color, self.font)
+        self.line_icon_label.configure(image=self.line_icon, background=background)
+
+        prefix = departure.stop_point.prefix if departure.stop_point.prefix is not None else ""
+        suffix = departure.stop_point.suffix if departure.stop_point.suffix is not None else ""
+        platform_text = (prefix + " " + departure.platform + " " + suffix) if departure.platform is not None else (prefix + " N/A " + suffix)
+
+        self.destination_var.set(departure.destination)
+        self.platform_var.set(platform_text)
+        self.time_text_var.set(time_str)
+
+
+def find_stop_point(stop_point_ref: str, all_stations: list[Station]) -> tuple[Station, StopPoint]:
+    """The nested loop over all stations and stop points the parser ran to find the stop point of every response"""
+    for station in all_stations:
+        for stop_point in station.stop_points:
+            if stop_point.stop_point_ref == stop_point_ref:
+                departure_station = station
+                departure_stop_point = stop_point
+    return departure_station, departure_stop_point
+
+
+def get_departures_for_window(window, all_departures: list[Departure]) -> list[Departure]:
+    """The linear scan over all departures, comparing stations by value, that was run for every window"""
+    window_departures: list[Departure] = []
+    for departure in all_departures:
+        if departure.station == window.station:
+            window_departures.append(departure)
+    return window_departures
+
+
+def select_departures(departures: list[Departure], time_zone: str, count: int) -> list[Departure]:
+    """The selection Window.refresh ran: asking for the time for every departure and sorting all of them with a lambda key, to show only the first few"""
+    departures = [departure for departure in departures if get_time_from_now(departure.estimated_time or departure.planned_time, time_zone).total_seconds() >= 0]
+    departures.sort(key=lambda x: (x.estimated_time if x.estimated_time is not None else x.planned_time))
+    return departures[:count]
+
+
+def create_qr_code_image(size: int, qr_data: str, background: str, foreground: str, tmp_png_file: str) -> Image.Image:
+    """How every window's QR-Code label used to create its image: encode the content, write it to a PNG file, read it back and resize it (including the wrong slicing of the foreground color)"""
+    import pyqrcode
+
+    qrcode = pyqrcode.create(qr_data)
+    qrcode.png(tmp_png_file, scale=1, quiet_zone=2, background=(int(background[1:3], 16), int(background[3:5], 16), int(background[5:7], 16), 255), module_color=(int(foreground[1:2], 16), int(foreground[3:4], 16), int(foreground[4:5], 16), 255))
+    original = Image.open(tmp_png_file)
+    return original.resize((size, size))
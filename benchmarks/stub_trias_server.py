@@ -0,0 +1,80 @@
+"""A local stub of the TRIAS API answering every StopEventRequest with a generated response
+
+Run from the repository root: python -m benchmarks.stub_trias_server [port] [certfile keyfile]
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import re
+import ssl
+import sys
+import threading
+import time
+
+from benchmarks.trias_samples import stop_event_response
+
+
+class StubTriasServer(ThreadingHTTPServer):
+    """Threaded HTTP(S) server with keep-alive that counts the connections it accepted"""
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, number_of_results: int = 10, delay: float = 0, certfile: str | None = None, keyfile: str | None = None):
+        super().__init__(("127.0.0.1", port), StubTriasHandler)
+        self.number_of_results = number_of_results
+        self.delay = delay
+        # status code answered instead of a response while set, e.g. 503 to simulate an outage
+        self.failure_status: int | None = None
+        self.connections_accepted = 0
+        self.requests_handled = 0
+        self.scheme = "http"
+        if certfile is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+            self.scheme = "https"
+
+    @property
+    def url(self) -> str:
+        return f"{self.scheme}://127.0.0.1:{self.server_address[1]}/trias"
+
+    def get_request(self):
+        request = super().get_request()
+        self.connections_accepted += 1
+        return request
+
+    def start(self) -> "StubTriasServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StubTriasHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        match = re.search(rb"<StopPointRef>(.*?)</StopPointRef>", body)
+        stop_point_ref = match.group(1).decode() if match else "de:08212:3"
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.server.requests_handled += 1
+        if self.server.failure_status is not None:
+            self.send_response(self.server.failure_status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        response = stop_event_response(self.server.number_of_results, stop_point_ref)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    certfile, keyfile = (sys.argv[2], sys.argv[3]) if len(sys.argv) > 3 else (None, None)
+    server = StubTriasServer(port, certfile=certfile, keyfile=keyfile)
+    print(f"Serving stub TRIAS API on {server.url}")
+    server.serve_forever()
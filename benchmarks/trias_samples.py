@@ -0,0 +1,74 @@
+"""Generates TRIAS StopEventResponses with any number of results for use as recorded responses in benchmarks"""
+from datetime import datetime, timedelta
+import random
+
+LINES = [
+    ("Straßenbahn 2", "tram", "Wolfartsweier"),
+    ("Straßenbahn 4", "tram", "Waldstadt"),
+    ("S-Bahn S5", "rail", "Pforzheim Hbf"),
+    ("S-Bahn S1", "rail", "Hochstetten"),
+    ("Bus 62", "bus", "Heidenstücker"),
+    ("Bus SEV S5", "bus", "Söllingen"),
+    ("Zug 74 InterCityExpress", "rail", "Basel SBB"),
+    ("Zug 2023 InterCity", "rail", "Frankfurt (Main) Hbf"),
+]
+
+
+def stop_event_result(index: int, stop_point_ref: str, start: datetime, rng: random.Random) -> str:
+    published_line_name, mode, destination = LINES[index % len(LINES)]
+    planned_time = start + timedelta(minutes=index)
+    estimated_time = ""
+    if rng.random() < 0.7:
+        estimated_time = f"<trias:EstimatedTime>{(planned_time + timedelta(minutes=rng.randint(0, 5))).isoformat()}</trias:EstimatedTime>"
+    return f'''
+        <trias:StopEventResult>
+            <trias:ResultId>ID-{index}</trias:ResultId>
+            <trias:StopEvent>
+                <trias:ThisCall>
+                    <trias:CallAtStop>
+                        <trias:StopPointRef>{stop_point_ref}:01:{index % 4 + 1}</trias:StopPointRef>
+                        <trias:StopPointName><trias:Text>Durlacher Tor/KIT-Campus Süd</trias:Text><trias:Language>de</trias:Language></trias:StopPointName>
+                        <trias:PlannedBay><trias:Text>Gleis {index % 4 + 1}</trias:Text><trias:Language>de</trias:Language></trias:PlannedBay>
+                        <trias:ServiceDeparture>
+                            <trias:TimetabledTime>{planned_time.isoformat()}</trias:TimetabledTime>{estimated_time}
+                        </trias:ServiceDeparture>
+                        <trias:StopSeqNumber>{index % 20 + 1}</trias:StopSeqNumber>
+                    </trias:CallAtStop>
+                </trias:ThisCall>
+                <trias:Service>
+                    <trias:OperatingDayRef>{start.date().isoformat()}</trias:OperatingDayRef>
+                    <trias:JourneyRef>kvv:2100{index % len(LINES)}:E:H:j25:{index}</trias:JourneyRef>
+                    <trias:ServiceSection>
+                        <trias:LineRef>kvv:2100{index % len(LINES)}:E:H</trias:LineRef>
+                        <trias:DirectionRef>outward</trias:DirectionRef>
+                        <trias:Mode><trias:PtMode>{mode}</trias:PtMode><trias:Name><trias:Text>{mode}</trias:Text><trias:Language>de</trias:Language></trias:Name></trias:Mode>
+                        <trias:PublishedLineName><trias:Text>{published_line_name}</trias:Text><trias:Language>de</trias:Language></trias:PublishedLineName>
+                    </trias:ServiceSection>
+                    <trias:OriginText><trias:Text>Karlsruhe</trias:Text><trias:Language>de</trias:Language></trias:OriginText>
+                    <trias:DestinationText><trias:Text>{destination}</trias:Text><trias:Language>de</trias:Language></trias:DestinationText>
+                </trias:Service>
+            </trias:StopEvent>
+        </trias:StopEventResult>'''
+
+
+def stop_event_response(number_of_results: int, stop_point_ref: str = "de:08212:3", start: datetime | None = None, seed: int = 0) -> bytes:
+    """Returns a TRIAS StopEventResponse with the given number of results as utf-8 encoded bytes, just like the API sends it"""
+    if start is None:
+        start = datetime.now().astimezone().replace(microsecond=0)
+    rng = random.Random(seed)
+    results = "".join(stop_event_result(index, stop_point_ref, start, rng) for index in range(number_of_results))
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<trias:Trias xmlns:siri="http://www.siri.org.uk/siri" xmlns:trias="http://www.vdv.de/trias" xmlns:acsb="http://www.ifopt.org.uk/acsb" xmlns:ifopt="http://www.ifopt.org.uk/ifopt" xmlns:datex2="http://datex2.eu/schema/1_0/1_0" version="1.1">
+    <trias:ServiceDelivery>
+        <siri:ResponseTimestamp>{start.isoformat()}</siri:ResponseTimestamp>
+        <siri:ProducerRef>EFAController10.6.21.22-EFA-LV-1</siri:ProducerRef>
+        <siri:Status>true</siri:Status>
+        <trias:Language>de</trias:Language>
+        <trias:CalcTime>42</trias:CalcTime>
+        <trias:DeliveryPayload>
+            <trias:StopEventResponse>{results}
+            </trias:StopEventResponse>
+        </trias:DeliveryPayload>
+    </trias:ServiceDelivery>
+</trias:Trias>
+'''.encode("utf-8")
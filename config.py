@@ -1,5 +1,6 @@
 from log import logger
 import re
+from typing import Any, Callable
 import yaml
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
@@ -46,6 +47,12 @@ class Config:
         self._check_and_get_stations()
         self._check_and_get_credentials()
         self._check_and_get_colors()
+        self._check_and_get_api()
+        self._check_and_get_response_capture()
+        self._check_and_get_refresh()
+        self._check_and_get_icons()
+        self._check_and_get_line_colors()
+        self._check_and_get_render()
     
     def _check_and_get_general(self):
         """Checks if the general config section was typed correctly and, if true, saves it to the config object
@@ -222,6 +229,154 @@ class Config:
         except ValueError:
             logger.warning(f'The requestor_ref given by the config has an unusual length, are you shure it is correct?')
 
+    
+    def _check_and_get_optional_section(self,
+                                        name: str,
+                                        defaults: dict,
+                                        validators: dict[str, Callable[[Any], Any]],
+                                        check: Callable[[dict], str | None] | None = None) -> dict:
+        """Checks if an optional section was typed correctly and, if true, returns it. Settings that are not configured are set to their default values.
+
+        Args:
+            name (str): Name of the section
+            defaults (dict): All settings of the section and their default values
+            validators (dict[str, Callable[[Any], Any]]): Functions checking a setting's value, by setting. They return the value to use and raise ValueError if it is not valid.
+            check (Callable[[dict], str | None] | None, optional): Function checking the settings against each other, returning the name of the invalid setting or None. Defaults to None.
+
+        Raises:
+            KeyError: If a setting in the section is unknown
+            ValueError: If any setting does not have the value format expected
+
+        Returns:
+            dict: The section with all its settings
+        """
+        try:
+            setting = None
+            section_config = self.config.get(name) or {}
+            # check if any mentioned settings are unknown to prevent accidental mistyping of an optional setting
+            for setting in section_config.keys():
+                if setting not in defaults.keys():
+                    raise KeyError(setting)
+            section = defaults | section_config
+            
+            for setting, validate in validators.items():
+                section[setting] = validate(section[setting])
+            
+            setting = check(section) if check is not None else None
+            if setting is not None:
+                raise ValueError
+        except KeyError:
+            logger.critical(f'KeyError while reading {name} setting "{setting}", it is not a known setting, have you typed it correctly? Quitting program.', exc_info=True)
+            quit()
+        except ValueError:
+            logger.critical(f'ValueError while reading {name} setting "{setting}", it is not a valid value for this setting! Quitting program.', exc_info=True)
+            quit()
+        
+        return section
+    
+    def _check_and_get_api(self) -> None:
+        """Checks the optional api section (see _check_and_get_optional_section) and saves it to the api object
+        """
+        self.api: dict = self._check_and_get_optional_section("api", {
+            "pool_size": 4,
+            "connect_timeout": 5,
+            "read_timeout": 10,
+            "max_concurrent_requests": 4,
+            "cache_ttl": 0,
+            "cache_stale_ttl": 0,
+            "cache_directory": None,
+            "retries": 2,
+            "backoff_base": 0.5,
+            "backoff_max": 8,
+            "failure_threshold": 5,
+            "reset_timeout": 60,
+        }, {
+            "pool_size": Helper.int_in_range((1, None)),
+            "max_concurrent_requests": Helper.int_in_range((1, None)),
+            "failure_threshold": Helper.int_in_range((1, None)),
+            "retries": Helper.int_in_range((0, None)),
+            # requests refuses a timeout of 0
+            "connect_timeout": Helper.positive_float,
+            "read_timeout": Helper.positive_float,
+            "cache_ttl": Helper.float_in_range((0, None)),
+            "cache_stale_ttl": Helper.float_in_range((0, None)),
+            "backoff_base": Helper.float_in_range((0, None)),
+            "backoff_max": Helper.float_in_range((0, None)),
+            "reset_timeout": Helper.float_in_range((0, None)),
+            # an empty cache directory means keeping the cache in memory only
+            "cache_directory": Helper.none_if_empty,
+        })
+    
+    def _check_and_get_response_capture(self) -> None:
+        """Checks the optional response_capture section (see _check_and_get_optional_section) and saves it to the response_capture object
+        """
+        self.response_capture: dict = self._check_and_get_optional_section("response_capture", {
+            "enabled": False,
+            "directory": "responses",
+            "max_bytes": 5000000,
+            "backup_count": 5,
+            "compress": False,
+        }, {
+            "enabled": Helper.true_false,
+            "compress": Helper.true_false,
+            "max_bytes": Helper.int_in_range((0, None)),
+            "backup_count": Helper.int_in_range((0, None)),
+        })
+    
+    def _check_and_get_refresh(self) -> None:
+        """Checks the optional refresh section (see _check_and_get_optional_section) and saves it to the refresh object
+        """
+        self.refresh: dict = self._check_and_get_optional_section("refresh", {
+            "min_interval": 30,
+            "max_interval": 600,
+            "imminent_departure": 120,
+            "jitter": 0.1,
+        }, {
+            # 0 would request the stop points in a tight loop
+            "min_interval": Helper.positive_float,
+            "max_interval": Helper.positive_float,
+            "imminent_departure": Helper.positive_float,
+            "jitter": Helper.float_in_range((0, 1)),
+        }, lambda refresh: "max_interval" if refresh["min_interval"] > refresh["max_interval"] else None)
+
+    def _check_and_get_icons(self) -> None:
+        """Checks the optional icons section (see _check_and_get_optional_section) and saves it to the icons object
+        """
+        self.icons: dict = self._check_and_get_optional_section("icons", {
+            "warm_up": True,
+            "atlas_directory": None,
+            "max_icons": 512,
+            "max_bytes": 33554432,
+        }, {
+            "warm_up": Helper.true_false,
+            # an empty atlas directory means no atlas at all
+            "atlas_directory": Helper.none_if_empty,
+            "max_icons": Helper.int_in_range((1, None)),
+            "max_bytes": Helper.int_in_range((1, None)),
+        })
+
+    def _check_and_get_line_colors(self) -> None:
+        """Checks the optional line_colors section (see _check_and_get_optional_section) and saves it to the line_colors object
+        """
+        self.line_colors: dict = self._check_and_get_optional_section("line_colors", {
+            "operators": ["kvv"],
+        }, {
+            "operators": Helper.non_empty_list,
+        })
+
+    def _check_and_get_render(self) -> None:
+        """Checks the optional render section (see _check_and_get_optional_section) and saves it to the render object
+        """
+        self.render: dict = self._check_and_get_optional_section("render", {
+            "backend": "tk",
+            "output_directory": "frames",
+            "save_interval": 60,
+        }, {
+            "backend": Helper.one_of(["tk", "headless"]),
+            "output_directory": Helper.not_empty,
+            "save_interval": Helper.float_in_range((0, None)),
+        })
+
 
 class Helper:
     hex_color_regex = r'^#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})$'
@@ -316,6 +471,125 @@ class Helper:
         """  
         if str(string).lower() not in valid_values:
             raise ValueError
+    
+    # The following methods are validators for the settings of optional sections (see Config._check_and_get_optional_section). They return the value to use and raise ValueError if it is not valid.
+    
+    @staticmethod
+    def int_in_range(range: tuple[float, float] | tuple[None, float] | tuple[float, None]) -> Callable[[Any], int]:
+        """Returns a validator for integers in a range (including its limits)
+
+        Args:
+            range (tuple[float, float] | tuple[None, float] | tuple[float, None]): The range, None for no limit
+
+        Returns:
+            Callable[[Any], int]: The validator
+        """
+        def validate(value) -> int:
+            Helper.is_int(value)
+            if not Helper.is_in_range(int(value), range):
+                raise ValueError
+            return int(value)
+        return validate
+    
+    @staticmethod
+    def float_in_range(range: tuple[float, float] | tuple[None, float] | tuple[float, None]) -> Callable[[Any], float]:
+        """Returns a validator for numbers in a range (including its limits)
+
+        Args:
+            range (tuple[float, float] | tuple[None, float] | tuple[float, None]): The range, None for no limit
+
+        Returns:
+            Callable[[Any], float]: The validator
+        """
+        def validate(value) -> float:
+            Helper.is_float(value)
+            if not Helper.is_in_range(float(value), range):
+                raise ValueError
+            return float(value)
+        return validate
+    
+    @staticmethod
+    def positive_float(value) -> float:
+        """Validator for numbers above 0
+
+        Args:
+            value: The value to check
+
+        Returns:
+            float: The number
+        """
+        Helper.is_float(value)
+        if float(value) <= 0:
+            raise ValueError
+        return float(value)
+    
+    @staticmethod
+    def true_false(value) -> bool:
+        """Validator for switches spelling either "true" or "false", regardless of case
+
+        Args:
+            value: The value to check
+
+        Returns:
+            bool: The switch
+        """
+        Helper.is_true_false_caseinsensitive(value)
+        return str(value).lower() == "true"
+    
+    @staticmethod
+    def one_of(valid_values: list[str]) -> Callable[[Any], str]:
+        """Returns a validator for strings spelling one of the valid values, regardless of case
+
+        Args:
+            valid_values (list[str]): The valid values in lower case
+
+        Returns:
+            Callable[[Any], str]: The validator, returning the value in lower case
+        """
+        def validate(value) -> str:
+            Helper.is_true_false_caseinsensitive(value, valid_values)
+            return str(value).lower()
+        return validate
+    
+    @staticmethod
+    def none_if_empty(value):
+        """Validator for optional values, where an empty value means none at all
+
+        Args:
+            value: The value to check
+
+        Returns:
+            The value, None if it is empty
+        """
+        return None if value in ["", "None", "none"] else value
+    
+    @staticmethod
+    def not_empty(value):
+        """Validator for values that must not be empty
+
+        Args:
+            value: The value to check
+
+        Returns:
+            The value
+        """
+        if value in [None, "", "None", "none"]:
+            raise ValueError
+        return value
+    
+    @staticmethod
+    def non_empty_list(value) -> tuple[str, ...]:
+        """Validator for non empty lists of non empty strings
+
+        Args:
+            value: The value to check
+
+        Returns:
+            tuple[str, ...]: The strings
+        """
+        if not isinstance(value, list) or len(value) == 0 or any(item in [None, ""] for item in value):
+            raise ValueError
+        return tuple(str(item) for item in value)
 
 if __name__ == "__main__":
     print(Config().config)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Literal
 
@@ -19,17 +19,36 @@ class Station:
     name: str
     stop_points: list[StopPoint]
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Departure:
-    """Class for a Departure and all its for display necessary information
+    """Class for a Departure and all its for display necessary information. Departures are immutable and hashable, so they can be deduplicated and compared across refreshes. The string fields are interned by the parser, so all departures share one copy of every mode, color, line number and destination.
     """    
     line_number: str
     destination: str
     platform: str
-    station: Station
-    stop_point: StopPoint
+    station: Station = field(hash=False) # stations and stop points are shared by reference and mutable, so they are left out of the hash
+    stop_point: StopPoint = field(hash=False)
     mode: Literal["all", "unknown", "air", "bus", "trolleyBus", "tram", "coach", "rail", "intercityRail", "urbanRail", "metro", "water", "cable-way", "funicular", "taxi"]
     background_color: str
     text_color: str
     planned_time: datetime
-    estimated_time: datetime | None = None
\ No newline at end of file
+    estimated_time: datetime | None = None
+    journey_ref: str | None = None
+    operating_day: str | None = None # journey references are only unique within their operating day
+    cancelled: bool = False
+    effective_time: datetime = field(init=False, repr=False, compare=False, hash=False) # the estimated time if available, otherwise the planned time; computed once, as it's the sort key of all departures
+    
+    def __post_init__(self):
+        # the departure is frozen, so the computed field has to be set around it
+        object.__setattr__(self, "effective_time", self.estimated_time if self.estimated_time is not None else self.planned_time)
+    
+    @property
+    def identity(self) -> tuple:
+        """Returns what identifies this departure's trip at its stop point across refreshes, regardless of changing times, platforms or cancellations: the stop point, operating day, journey reference and planned time, or, if the API didn't send a journey reference, the stop point, line, destination and planned time
+
+        Returns:
+            tuple: The identity
+        """
+        if self.journey_ref is not None:
+            return (self.stop_point.stop_point_ref, self.operating_day, self.journey_ref, self.planned_time)
+        return (self.stop_point.stop_point_ref, self.line_number, self.destination, self.planned_time)
@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from operator import attrgetter
+
+from data_classes import Departure
+
+@dataclass(frozen=True)
+class ChangeSet:
+    """Class for the changes between two states of the known departures
+    """
+    added: tuple[Departure, ...] = ()
+    updated: tuple[tuple[Departure, Departure], ...] = () # (previous, current) departure of the same trip
+    removed: tuple[Departure, ...] = ()
+
+    def __bool__(self) -> bool:
+        return len(self.added) > 0 or len(self.updated) > 0 or len(self.removed) > 0
+
+    def get_station_names(self) -> set[str]:
+        """Returns the names of all stations whose departures changed
+
+        Returns:
+            set[str]: The station names
+        """
+        departures = list(self.added) + list(self.removed) + [current for _, current in self.updated]
+        return {departure.station.name for departure in departures}
+
+    @staticmethod
+    def combine(first: "ChangeSet", second: "ChangeSet") -> "ChangeSet":
+        """Returns the changes of applying two change sets after each other, e.g. a trip added by the first and removed by the second one doesn't show up at all
+
+        Args:
+            first (ChangeSet): The earlier changes
+            second (ChangeSet): The later changes
+
+        Returns:
+            ChangeSet: The combined changes
+        """
+        # identity -> (departure before the first changes or None if it didn't exist, departure after the second changes or None if it was removed)
+        states: dict[tuple, tuple[Departure | None, Departure | None]] = {}
+        for change_set in (first, second):
+            transitions = [(None, departure) for departure in change_set.added] + list(change_set.updated) + [(departure, None) for departure in change_set.removed]
+            for previous, current in transitions:
+                identity = (previous or current).identity
+                before = states[identity][0] if identity in states else previous
+                states[identity] = (before, current)
+
+        added, updated, removed = [], [], []
+        for before, after in states.values():
+            if before is None and after is not None:
+                added.append(after)
+            elif before is not None and after is None:
+                removed.append(before)
+            elif before is not None and after is not None and before != after:
+                updated.append((before, after))
+
+        return ChangeSet(added=tuple(added), updated=tuple(updated), removed=tuple(removed))
+
+class DepartureMerger:
+    """Class for a merge engine that keeps the known departures of every stop point across refreshes, matching them by their trip's identity (see Departure.identity) instead of throwing them away
+    """
+    def __init__(self):
+        """Creates the merger without any known departures
+        """
+        # stop_point_ref -> (identity -> departure), ordered by their effective time
+        self._departures: dict[str, dict[tuple, Departure]] = {}
+
+    def merge(self, stop_point_ref: str, departures: list[Departure]) -> ChangeSet:
+        """Merges the latest departures of a stop point into the known ones: new trips are added, changed ones (e.g. a new estimated time, platform or cancellation) replace their previous state and trips that are no longer in the response are removed. Unchanged departures keep being the same objects.
+
+        Args:
+            stop_point_ref (str): StopPointRef the departures were requested for
+            departures (list[Departure]): The stop point's latest departures
+
+        Returns:
+            ChangeSet: The changes made to the stop point's departures
+        """
+        known = self._departures.get(stop_point_ref, {})
+        merged: dict[tuple, Departure] = {}
+        added: list[Departure] = []
+        updated: list[tuple[Departure, Departure]] = []
+
+        # keep every stop point's departures ordered by their effective time, so they can be merged into the station's departures without sorting those (the API already sends them (almost) in order, so this is cheap)
+        for departure in sorted(departures, key=attrgetter("effective_time")):
+            identity = departure.identity
+            previous = known.get(identity)
+            if previous is None:
+                added.append(departure)
+                merged[identity] = departure
+            elif previous != departure:
+                updated.append((previous, departure))
+                merged[identity] = departure
+            else:
+                merged[identity] = previous
+
+        removed = [departure for identity, departure in known.items() if identity not in merged]
+        self._departures[stop_point_ref] = merged
+
+        return ChangeSet(added=tuple(added), updated=tuple(updated), removed=tuple(removed))
+
+    def get_all_departures(self) -> dict[str, list[Departure]]:
+        """Returns the known departures of all stop points
+
+        Returns:
+            dict[str, list[Departure]]: Departures by StopPointRef, each ordered by their effective time
+        """
+        return {stop_point_ref: list(departures.values()) for stop_point_ref, departures in self._departures.items()}
@@ -0,0 +1,162 @@
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from datetime import datetime
+import queue
+import threading
+
+from data_classes import StopPoint, Departure
+from departure_merger import ChangeSet, DepartureMerger
+from helper_functions import get_departures_from_xml
+from KVV import KVV
+from line_colors import LineColors
+from log import logger
+from refresh_scheduler import RefreshScheduler
+from station_index import StationIndex
+
+@dataclass(frozen=True)
+class RefreshResult:
+    """Class for the result of one refresh cycle, handed from the worker thread to the Tk thread
+    """
+    departures_by_station: dict[str, tuple[Departure, ...]] # all departures known, by station name
+    changes: ChangeSet # changes since the previous result
+    outdated: dict[str, datetime] # stop_point_ref -> time of the last successful update, for every stop point whose latest update failed
+
+class DepartureWorker:
+    """Class for a background worker that fetches and parses departures off the Tk main thread, so that only widget updates happen on it
+    """
+    def __init__(self,
+                 kvv: KVV,
+                 stop_points: list[StopPoint],
+                 station_index: StationIndex,
+                 line_colors: LineColors,
+                 scheduler: RefreshScheduler,
+                 number_of_results: int = 10):
+        """Creates the worker. It does not start working until start() is called.
+
+        Args:
+            kvv (KVV): The API handler used to request the departures
+            stop_points (list[StopPoint]): All stop points to request departures for
+            station_index (StationIndex): Index of all stations and their stop points
+            line_colors (LineColors): The line color registry used to color the line icons
+            scheduler (RefreshScheduler): The scheduler deciding when each stop point is requested again
+            number_of_results (int, optional): Number of results to request per stop point. Defaults to 10.
+        """
+        self.kvv = kvv
+        self.stop_points = stop_points
+        self.station_index = station_index
+        self.line_colors = line_colors
+        self.scheduler = scheduler
+        self.number_of_results = number_of_results
+        
+        # latest departures, merged across refreshes, and the time of their update by stop_point_ref, only accessed by the worker thread
+        self.merger = DepartureMerger()
+        self.updated: dict[str, datetime] = {}
+        self.outdated: dict[str, datetime] = {}
+
+        # thread safe queue the results are handed to the Tk thread with
+        self.results: queue.Queue[RefreshResult] = queue.Queue()
+
+        self._wake_up = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="DepartureWorker", daemon=True)
+        
+        # the worker parsed the stale response already, so request the fresh one right away instead of at the next scheduled request
+        self.kvv.add_revalidation_consumer(self._revalidated)
+
+    def start(self):
+        """Starts the worker thread
+        """
+        self._thread.start()
+
+    def _revalidated(self, stop_point_ref: str):
+        """Makes a stop point due and wakes the worker up after its cached response was refreshed in the background (see KVV.add_revalidation_consumer)
+
+        Args:
+            stop_point_ref (str): StopPointRef of the refreshed response
+        """
+        self.scheduler.make_due(stop_point_ref)
+        self._wake_up.set()
+
+    def get_latest_result(self) -> RefreshResult | None:
+        """Returns the newest result handed over by the worker without blocking. Older results that have not been picked up yet are discarded.
+
+        Returns:
+            RefreshResult | None: The newest result, None if there is no new one
+        """
+        latest = None
+        try:
+            while True:
+                result = self.results.get_nowait()
+                # keep the changes of the discarded results
+                if latest is not None:
+                    result = replace(result, changes=ChangeSet.combine(latest.changes, result.changes))
+                latest = result
+        except queue.Empty:
+            return latest
+
+    def _run(self):
+        """Worker thread loop: start requesting all due stop points, hand over the result of every stop point as soon as its request finished, wait for the next stop point to be due or a request to finish (or to be woken up) and do it all again
+        """
+        stop_point_refs = [stop_point.stop_point_ref for stop_point in self.stop_points]
+        
+        # stop_point_ref -> request that hasn't been handed over yet, so that a slow stop point never holds back the others
+        in_flight: dict[str, Future] = {}
+        
+        while True:
+            # cleared before looking at the requests, so that one finishing in the meantime still wakes the worker up
+            self._wake_up.clear()
+            
+            # start requesting every due stop point that isn't being requested already
+            for stop_point_ref in self.scheduler.get_due([stop_point_ref for stop_point_ref in stop_point_refs if stop_point_ref not in in_flight]):
+                future = self.kvv.submit(stop_point_ref, number_of_results=self.number_of_results)
+                future.add_done_callback(lambda _: self._wake_up.set())
+                in_flight[stop_point_ref] = future
+            
+            finished = {stop_point_ref: future for stop_point_ref, future in in_flight.items() if future.done()}
+            if finished:
+                for stop_point_ref in finished:
+                    del in_flight[stop_point_ref]
+                try:
+                    self.results.put(self._refresh(finished))
+                except Exception:
+                    logger.exception("error in refreshing departures")
+                    # treat them as failed requests, so they are tried again after the minimum interval instead of right away
+                    for stop_point_ref in finished:
+                        self.scheduler.schedule(stop_point_ref, None)
+                continue
+
+            self._wake_up.wait(self.scheduler.get_seconds_until_due([stop_point_ref for stop_point_ref in stop_point_refs if stop_point_ref not in in_flight]))
+
+    def _refresh(self, finished: dict[str, Future]) -> RefreshResult:
+        """Parses the latest departures of all stop points whose requests finished and schedules their next request
+
+        Args:
+            finished (dict[str, Future]): The finished requests (see KVV.submit) by StopPointRef
+
+        Returns:
+            RefreshResult: All departures known, including the ones of the stop points not requested this time
+        """
+        changes = ChangeSet()
+        
+        # cycle through all finished stop points to get their latest departures
+        for stop_point_ref, future in finished.items():
+            departures = None
+            response = self.kvv.get_response(stop_point_ref, future)
+            if response is not None:
+                try:
+                    # Read the API response and merge the parsed departures into the stop point's known ones
+                    departures = get_departures_from_xml(stop_point_ref, response, self.station_index, self.line_colors)
+                    changes = ChangeSet.combine(changes, self.merger.merge(stop_point_ref, departures))
+                except Exception:
+                    logger.exception("error in creating departures from xml tree", stack_info=True)
+            self.scheduler.schedule(stop_point_ref, departures)
+            
+            # keep showing the last good departures if the update failed, but remember since when they are outdated (for a stop point that never loaded, since its first failure)
+            if departures is None:
+                self.outdated.setdefault(stop_point_ref, self.updated.get(stop_point_ref, datetime.now()))
+            else:
+                self.updated[stop_point_ref] = datetime.now()
+                self.outdated.pop(stop_point_ref, None)
+
+        return RefreshResult(departures_by_station=StationIndex.bucket_by_station(self.merger.get_all_departures()),
+                             changes=changes,
+                             outdated=dict(self.outdated))
@@ -1,21 +1,77 @@
 from datetime import datetime
 from PIL import Image, ImageTk
-import pyqrcode
 import tkinter as tk
+from typing import Callable
 
 from config import Config
 from data_classes import Station, Departure
-from helper_functions import get_time_from_now
+from gui_layout import DepartureRow, WindowContent, WindowLayout
 from gui_line_icons import LineIcons
+from gui_qr_code import QRCodes
 from log import logger
 
+class DisplayTicker:
+    """A class for a single timer shared by all windows that fires right after every full second, formats the time once and updates all clock labels and other per-second consumers with it
+    """
+    def __init__(self, widget: tk.Misc):
+        """Starts the ticker
+
+        Args:
+            widget (tk.Misc): Any Tk widget, used to schedule the ticks
+        """
+        self.widget = widget
+        
+        self.clock_labels: list[tk.Label] = []
+        self.consumers: list[Callable[[datetime], None]] = []
+        
+        self._schedule()
+    
+    def add_clock(self, label: tk.Label):
+        """Registers a label to show the current time, starting right away
+
+        Args:
+            label (tk.Label): The clock label
+        """
+        self.clock_labels.append(label)
+        label.configure(text=datetime.now().strftime('%H:%M:%S'))
+    
+    def add_consumer(self, consumer: Callable[[datetime], None]):
+        """Registers a function to be called every second, after the clocks were updated
+
+        Args:
+            consumer (Callable[[datetime], None]): The function, called with the current time
+        """
+        self.consumers.append(consumer)
+    
+    def _schedule(self):
+        """Schedules the next tick right after the next full second
+        """
+        self.widget.after(1000 - datetime.now().microsecond // 1000, self._tick)
+    
+    def _tick(self):
+        """Updates all clocks and calls all consumers, then schedules the next tick
+        """
+        self._schedule()
+        
+        now = datetime.now()
+        string = now.strftime('%H:%M:%S')
+        for label in self.clock_labels:
+            label.configure(text=string)
+        
+        for consumer in self.consumers:
+            try:
+                consumer(now)
+            except Exception:
+                logger.exception("error in display ticker consumer")
+
 class Window:
     """A class for every Window to be displayed
     """    
     @staticmethod
     def create_windows(config: Config,
                        all_stations: dict[Station],
-                       icon_handler: LineIcons) -> list["Window"]:
+                       icon_handler: LineIcons,
+                       ticker: DisplayTicker) -> list["Window"]:
         """Creates all Windows found in the specified config
 
         Returns:
@@ -31,17 +87,18 @@ class Window:
                 if station.name == window_config["station"]:
                     break
             # create the window object and add it to the list
-            windows.append(Window(window_config, station, icon_handler, config))
+            windows.append(Window(window_config, station, icon_handler, ticker, config))
         
         return windows
 
-    def __init__(self, window_config: dict, station: Station, icon_handler: LineIcons, config: Config, number_of_departure_entries: int = 10):
+    def __init__(self, window_config: dict, station: Station, icon_handler: LineIcons, ticker: DisplayTicker, config: Config, number_of_departure_entries: int = 10):
         """Creates a Window by setting variables, creating the windows widgets and filling it with (emtpy) departure entries
 
         Args:
             window_config (dict): The window's config dict
             station (Station): The station object assigned to this window
             icon_handler (LineIcons): The Icon handler that creates and caches the icons
+            ticker (DisplayTicker): The ticker shared by all windows that updates the clock
             config (Config): the whole config object
             number_of_departure_entries (int, optional): Number of entries to fit onto this screen. Defaults to 10.
         """      
@@ -72,21 +129,30 @@ class Window:
         self.height = window_config["height"]
         self.width = window_config["width"]
         
-        # calculate and create header
-        header_height = int(self.height / 12)
-        departure_frame_height = self.height - header_height
-        self.DepartureEntry_height = int(((departure_frame_height) / (number_of_departure_entries * 2 + 1)) * 2) # +1 for departure entry header (column description)
-        self.padding_size = int(self.height / 75)
-        self.header_font = ("liberation sans", int(self.height / 25))
-        self.DepartureEntry_font = ("liberation sans", int(self.height / 25))
+        # calculate the sizes of the header and the departure entries (shared with the headless backend, see gui_layout.py)
+        self.layout = WindowLayout.create(self.width, self.height, number_of_departure_entries)
+        header_height = self.layout.header_height
+        self.DepartureEntry_height = self.layout.departure_entry_height
+        self.padding_size = self.layout.padding_size
+        self.header_font = self.layout.header_font
+        self.DepartureEntry_font = self.layout.departure_entry_font
 
         # create variable for station name to be displayed in the header
         self.stationname = tk.StringVar(value=self.station.name)
+        self.stationname_shown = self.station.name
+        
+        # number of Tk calls issued by all refreshes and by the last one, the departure entries only update widgets whose value changed
+        self.tk_calls = 0
+        self.last_refresh_tk_calls = 0
+        
+        # departures currently shown and the time of their last successful update if they are outdated, see tick()
+        self.departures: list[Departure] = []
+        self.outdated_since: datetime | None = None
         
         # list of all icons used by a window
         #TODO: make this use general configs; not hardcoded
         self.icons = {
-            "stop": ImageTk.PhotoImage(Image.open("images/stop_icon.png").resize((int(header_height - 2 * self.padding_size), int(header_height - 2 * self.padding_size)))),
+            "stop": ImageTk.PhotoImage(Image.open("images/stop_icon.png").resize((self.layout.get_stop_icon_size(), self.layout.get_stop_icon_size()))),
         }
 
         # create header frame
@@ -105,19 +171,12 @@ class Window:
         self.timelabel = tk.Label(self.headerframe, text="", font=self.header_font, anchor="w", justify="right", fg=self.config.colors["header_text"], bg=self.config.colors["header_background"])
         self.timelabel.pack(side="right", padx=self.padding_size)
         
-        # calculate and refresg time every second
-        def time():
-            self.timelabel.after(1000, time)
-            string = datetime.now().strftime('%H:%M:%S')
-            self.timelabel.config(text=string)
-        time()
+        # let the shared ticker refresh the time every second
+        ticker.add_clock(self.timelabel)
         
-        # add a QR-Code to the header (if configred in settings)
-        if self.config.general["QR-Code-content"] is not None and self.config.general["QR-Code-height"] > 0:
-            self.qr_code = QRCodeLabel(self.headerframe, int(header_height * self.config.general["QR-Code-height"]), self.config.general["QR-Code-content"], self.config.colors["qr_code_background"], self.config.colors["qr_code_foregreound"])
-            self.qr_code.configure(height=header_height, width=header_height, background=self.config.colors["header_background"])
-            self.qr_code.pack(side="right")
-            self.qr_code.pack_propagate(0)
+        # the QR-Code is added to the header later (see create_qr_code), so that the window can be shown without waiting for it
+        self.header_height = header_height
+        self.qr_code = None
         
         # create the frame for the departures to be shown
         self.departuresframe = tk.Frame(window)
@@ -132,29 +191,51 @@ class Window:
         for i in range(number_of_departure_entries):
             self.departure_entries.append(DepartureEntry(self))
         
-    def refresh(self, departures: list[Departure] | None):
+    def create_qr_code(self, qr_codes: QRCodes):
+        """Adds a QR-Code to the header (if configred in settings)
+
+        Args:
+            qr_codes (QRCodes): QR-Code handler shared by all windows
+        """
+        if self.config.general["QR-Code-content"] is not None and self.config.general["QR-Code-height"] > 0:
+            self.qr_code = QRCodeLabel(self.headerframe, qr_codes, self.layout.get_qr_code_size(self.config.general["QR-Code-height"]), self.config.general["QR-Code-content"], self.config.colors["qr_code_background"], self.config.colors["qr_code_foregreound"])
+            self.qr_code.configure(height=self.header_height, width=self.header_height, background=self.config.colors["header_background"])
+            # pack it right of the station name, just left of the clock
+            self.qr_code.pack(side="right", after=self.timelabel)
+            self.qr_code.pack_propagate(0)
+        
+    def refresh(self, departures: list[Departure] | tuple[Departure, ...] | None, outdated_since: datetime | None = None):
         """Refreshes the information of this window with the new specified departures
 
         Args:
-            departures (list[Departure] | None): List of Departures to populate this window with
+            departures (list[Departure] | tuple[Departure, ...] | None): Departures to populate this window with
+            outdated_since (datetime | None, optional): Time of the last successful update, if the departures could not be updated. Defaults to None.
         """        
         
-        # sort all departures by their estimated time if available. if not, fall back to their planned time
-        departures.sort(key=lambda x: (x.estimated_time if x.estimated_time is not None else x.planned_time))
+        # count the Tk calls issued by this refresh
+        tk_calls_before = self.tk_calls
+        
+        # compute the header text and departure entries (shared with the headless backend, see gui_layout.py)
+        content = WindowContent.create(self.station.name, departures, outdated_since, self.config.colors, self.config.general["time_zone"], self.number_of_departure_entries)
+        if content.stationname != self.stationname_shown:
+            self.stationname.set(content.stationname)
+            self.stationname_shown = content.stationname
+            self.tk_calls += 1
         
-        #TODO: handle no departures
-        if len(departures) < 1 or departures is None:
-            return
+        # remember the departures, so that tick() can count them down without new data
+        self.departures = content.departures
+        self.outdated_since = outdated_since
         
-        for i in range(len(departures)):
-            self.departure_entries[i + 1].update(departures[i], self.icon_handler, i)
-            if i + 1 >= self.number_of_departure_entries:
-                # stop in case there are more departures than can be shown in this window
-                break
+        # Fill the departure entries below the departure entry header, the ones left over are cleared
+        for departure_entry, row in zip(self.departure_entries[1:], content.rows):
+            departure_entry.update(row, self.icon_handler)
+        
+        self.last_refresh_tk_calls = self.tk_calls - tk_calls_before
     
-        # Add departures below the departure entry header
-        for DepartureEntry in self.departure_entries[i + 2:]:
-            DepartureEntry.clear(i)
+    def tick(self):
+        """Counts down the departures shown without new data: recomputes their times and drops the ones that have passed. Only the widgets whose values changed are updated.
+        """
+        self.refresh(self.departures, self.outdated_since)
 
 class DepartureEntry:
     """A class for a single departure entry to be displayed within windows
@@ -168,9 +249,9 @@ class DepartureEntry:
         
         # Create some instance wide variables from arguments
         self.window = window
-        self.height = window.DepartureEntry_height
-        self.padding = int(self.height / 8)
-        self.font = window.DepartureEntry_font
+        self.height = window.layout.departure_entry_height
+        self.padding = window.layout.departure_entry_padding
+        self.font = window.layout.departure_entry_font
         background = self.window.config.colors["departure_entry_lighter"]
         text_color = self.window.config.colors["departure_entry_text"]
         
@@ -195,85 +276,101 @@ class DepartureEntry:
         
         self.line_icon_label = tk.Label(self.frame, bg=background)
         self.line_icon_label.place(anchor="center", x=self.height, rely=0.5)
+        
+        # The values currently shown by the widgets, so that only widgets whose value changed are updated
+        self.shown: dict[str, object] = {
+            "background": background,
+            "icon": None,
+            "destination": "",
+            "platform": "",
+            "time": "",
+        }
+        self.line_icon = None
+    
+    def _show(self, name: str, value, apply) -> bool:
+        """Shows a new value in the widgets, but only if it differs from the one shown already
+
+        Args:
+            name (str): Name of the value in the shown dict
+            value: The new value
+            apply: Function applying the value to the widgets, returns the number of Tk calls it issued
+
+        Returns:
+            bool: True, if the widgets had to be updated
+        """
+        if self.shown[name] == value:
+            return False
+        
+        self.window.tk_calls += apply(value)
+        self.shown[name] = value
+        return True
+    
+    def _apply_background(self, background: str) -> int:
+        """Sets a new background to all the widgets (for use with _show)
+
+        Args:
+            background (str): The background color
+
+        Returns:
+            int: Number of Tk calls issued
+        """
+        for widget in [self.frame, self.destination_label, self.platform_label, self.time_label, self.line_icon_label]:
+            widget.configure(background=background)
+        return 5
+    
+    def get_icon_parameters(self, line_number: str) -> tuple[str, int, int, int]:
+        """Returns the text and dimensions of the line icon of a line in this departure entry
+
+        Args:
+            line_number (str): The line number
+
+        Returns:
+            tuple[str, int, int, int]: Tuple of (text, width, height, corner radius) of the icon
+        """
+        return self.window.layout.get_icon_parameters(line_number)
     
-    def update(self, departure: Departure, icon_handler: LineIcons, index: int):
+    def update(self, row: DepartureRow, icon_handler: LineIcons):
         """Update a departure entry frame / its contents. Creating new ones takes waay to long and is also kinda ugly. This method instead allows quietly updating values without taking too long and wihtout disrutping the user experience
 
         Args:
-            departure (Departure): Object to the departure to update
+            row (DepartureRow): Content to show, an empty departure entry if it has no departure (see gui_layout.py)
             icon_handler (LineIcons): The Icon handler which creates and caches line icons
-            index (int): Index of this departure in the list. Used for alternating background of entries
         """        
-        
-        # Alternate Background of departure entries
-        if index % 2:
-            background = self.window.config.colors["departure_entry_darker"]
-        else:
-            background = self.window.config.colors["departure_entry_lighter"]
-            
-        # Set new background to all the widgets
-        self.frame.configure(background=background)
-        self.destination_label.configure(background=background)
-        self.platform_label.configure(background=background)
-        self.time_label.configure(background=background)
-
-        # Choose estimated time if one is available, otherwise use planned time
-        if departure.estimated_time is None:
-            time_shown = departure.planned_time
-        else:
-            time_shown = departure.estimated_time
-        
-        # get total seconds from now until departure
-        seconds = get_time_from_now(time_shown, self.window.config.general["time_zone"]).total_seconds()
-
-        # Format the time string based on remaining seconds
-        if seconds < 60:
-            time_str = "Jetzt"
-        elif seconds < 3600:
-            time_str = f"{int(seconds // 60)} min"
-        else:
-            time_str = f"{int(seconds // 3600)} h {int((seconds % 3600) // 60)} min"
-
-        # Scalar for general size appearance of icon size
-        icon_scale = 0.8
-
-        # Preprocess line number
-        text = departure.line_number
-        if text == "InterCityExpress": text = "ICE"
-        if text == "InterCity": text = "IC"
-        # Some black magic to make nice icon dimension while being adaptive to line number length
-        icon_width = int(icon_scale * (self.height * (text.__len__()*0.4) + 2.5 * self.padding))
-        icon_height = int(icon_scale * (self.height - 2* self.padding))
-        
-        # Create the icon (-> gui_line_icons.py)
-        self.line_icon_label.configure(image=icon_handler.get_icon(departure.mode, icon_width, icon_height, int((icon_height) / 4), text, departure.background_color, departure.text_color, self.font), background=background)
-
-        # Platform formatting stuff
-        prefix = departure.stop_point.prefix if departure.stop_point.prefix is not None else ""
-        suffix = departure.stop_point.suffix if departure.stop_point.suffix is not None else ""
-        platform_text = (prefix + " " + departure.platform + " " + suffix) if departure.platform is not None else (prefix + " N/A " + suffix)
+        self._show("background", row.background, self._apply_background)
+
+        # Create the icon (-> gui_line_icons.py) only if the line changed, and keep a reference to it, so it stays alive even if the icon cache evicts it
+        def apply_icon(icon: tuple[str, str, str, str] | None) -> int:
+            if icon is None:
+                self.line_icon = None
+                self.line_icon_label.configure(image="")
+                return 1
+            mode, line_number, icon_color, text_color = icon
+            text, icon_width, icon_height, icon_radius = self.get_icon_parameters(line_number)
+            self.line_icon = icon_handler.get_icon(mode, icon_width, icon_height, icon_radius, text, icon_color, text_color, self.font)
+            self.line_icon_label.configure(image=self.line_icon)
+            return 1
+        departure = row.departure
+        self._show("icon", (departure.mode, departure.line_number, departure.background_color, departure.text_color) if departure is not None else None, apply_icon)
         
         # Update tkVars
-        self.destination_var.set(departure.destination)
-        self.platform_var.set(platform_text)
-        self.time_text_var.set(time_str)
-        
-    def clear(self, index: int):
-        """Clear this entry if no departure was found to fill it
+        self._show("destination", row.destination, self._set_var(self.destination_var))
+        self._show("platform", row.platform, self._set_var(self.platform_var))
+        self._show("time", row.time, self._set_var(self.time_text_var))
+    
+    @staticmethod
+    def _set_var(var: tk.StringVar):
+        """Returns a function that sets the tkVar to a value (for use with _show)
 
         Args:
-            index (int): Index of last filled departure entry for a non-alternating background in all the empty departure entries at the end
-        """        
-        self.line_icon_label.destroy()
-        self.destination_var.set("")
-        self.platform_var.set("")
-        self.time_text_var.set("")
+            var (tk.StringVar): The tkVar to set
         
-        # Apply background color
-        if index % 2:
-            self.frame.configure(background=self.window.config.colors["DepartureEntry_darker"])
-        else:
-            self.frame.configure(background=self.window.config.colors["DepartureEntry_lighter"])
+        Returns:
+            Callable[[str], int]: The function, returning the number of Tk calls it issued
+        """
+        def apply(value: str) -> int:
+            var.set(value)
+            return 1
+        return apply
         
 class DepartureEntry_Header(DepartureEntry):
     """A classs for the first DepartureEntry which acts as column description of the following departure entries
@@ -284,12 +381,10 @@ class DepartureEntry_Header(DepartureEntry):
         Args:
             window (Window): The window the departures will be displayed in
         """
-        # Use a smaller text size to use up less space
-        header_font = (window.DepartureEntry_font[0], int(window.DepartureEntry_font[1] / 2))
-        
-        # Reduce height and padding to leave mor space for departures
-        height = window.DepartureEntry_height / 2
-        padding = int(height / 8)
+        # Use a smaller text size, height and padding to leave mor space for departures
+        header_font = window.layout.column_header_font
+        height = window.layout.column_header_height
+        padding = window.layout.column_header_padding
         
         # Set background color
         background = window.config.colors["departure_entry_darker"]
@@ -317,11 +412,12 @@ class DepartureEntry_Header(DepartureEntry):
 class QRCodeLabel(tk.Label):
     """This Class creates a Tk Label that specificaly contains a QR-Code for the window header
     """    
-    def __init__(self, parent, size: int, qr_data, background: str, foreground: str):
+    def __init__(self, parent, qr_codes: QRCodes, size: int, qr_data, background: str, foreground: str):
         """Creates a Tk Label that specificaly contains a QR-Code for the window header
 
         Args:
             parent (_type_): Parent Tk widget
+            qr_codes (QRCodes): QR-Code handler shared by all windows
             size (int): size fo the QR-code in pixels
             qr_data (_type_): Content to be encoded in the QR-Code
             background (str): QR-Code Backround color hex code
@@ -331,17 +427,8 @@ class QRCodeLabel(tk.Label):
         # Init super Tk Label
         super().__init__(parent)
         
-        # Create a QR-Code image
-        qrcode = pyqrcode.create(qr_data)
-        tmp_png_file = "images/QRCode.png"        
-        qrcode.png(tmp_png_file, scale=1, quiet_zone=2, background=(int(background[1:3], 16), int(background[3:5], 16), int(background[5:7], 16), 255), module_color=(int(foreground[1:2], 16), int(foreground[3:4], 16), int(foreground[4:5], 16), 255))
-        
-        # Open and Resize the Image
-        self.original = Image.open(tmp_png_file)
-        resized = self.original.resize((size, size))
-        
-        # Convert it to a PhotoImage
-        self.image = ImageTk.PhotoImage(resized)
+        # Get the QR-Code image, windows of the same size share it
+        self.image = qr_codes.get_photo_image(str(qr_data), size, background, foreground)
         
         # Apply it to the Tk Label
         self.configure(image=self.image)
\ No newline at end of file
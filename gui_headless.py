@@ -0,0 +1,283 @@
+from datetime import datetime
+import heapq
+import itertools
+import os
+import time as timer
+from typing import Callable
+
+from PIL import Image, ImageDraw
+
+from config import Config
+from data_classes import Station, Departure
+from gui_layout import DepartureRow, WindowContent, WindowLayout
+from gui_line_icons import LineIcons
+from gui_qr_code import QRCodes
+from helper_functions import atomic_write
+from log import logger
+
+class HeadlessRoot:
+    """A class standing in for the Tk root in headless mode: it runs the callbacks scheduled with after() in a plain loop, so that the display pipeline (see main.py) runs without a display server
+    """
+    def __init__(self):
+        """Creates the root without any scheduled callbacks
+        """
+        # (time.monotonic() at which it is due, order of scheduling, callback)
+        self._scheduled: list[tuple[float, int, Callable[[], None]]] = []
+        self._counter = itertools.count()
+
+    def after(self, ms: int, callback: Callable[[], None]):
+        """Schedules a callback, just like Tk's after()
+
+        Args:
+            ms (int): Milliseconds until the callback is run
+            callback (Callable[[], None]): The callback
+        """
+        heapq.heappush(self._scheduled, (timer.monotonic() + ms / 1000, next(self._counter), callback))
+
+    def mainloop(self):
+        """Runs the scheduled callbacks when they are due, until there are none left
+        """
+        while len(self._scheduled) > 0:
+            due, _, callback = heapq.heappop(self._scheduled)
+            timer.sleep(max(due - timer.monotonic(), 0))
+
+            # just like Tk, an error in a callback doesn't stop the loop
+            try:
+                callback()
+            except Exception:
+                logger.exception("error in scheduled callback")
+
+    def update(self):
+        """Does nothing, the headless windows render their frames right away
+        """
+
+    def update_idletasks(self):
+        """Does nothing, the headless windows render their frames right away
+        """
+
+    def withdraw(self):
+        """Does nothing, there is no root window to hide
+        """
+
+class HeadlessWindow:
+    """A class for every window to be rendered to an image (and saved as PNG frame) instead of being displayed, with the same layout as gui.Window
+    """
+    @staticmethod
+    def create_windows(config: Config,
+                       all_stations: dict[Station],
+                       icon_handler: LineIcons,
+                       output_directory: str | None = None,
+                       save_interval: float = 0) -> list["HeadlessWindow"]:
+        """Creates all windows found in the specified config
+
+        Args:
+            config (Config): the whole config object
+            all_stations (dict[Station]): All stations
+            icon_handler (LineIcons): The Icon handler that creates the icons
+            output_directory (str | None, optional): Directory the frames are saved to as "window-<number>.png", None to only keep them in memory. Defaults to None.
+            save_interval (float, optional): Seconds between two saves of a frame whose departure entries and station name didn't change (see HeadlessWindow). Defaults to 0.
+
+        Returns:
+            list[HeadlessWindow]: A list of all windows created
+        """
+        if output_directory is not None:
+            os.makedirs(output_directory, exist_ok=True)
+
+        windows: list[HeadlessWindow] = []
+
+        # go through all windows configured
+        for index, window_config in enumerate(config.windows):
+            # go through all stations to find the one assigned to this window
+            for station in all_stations:
+                if station.name == window_config["station"]:
+                    break
+            filename = os.path.join(output_directory, f"window-{index}.png") if output_directory is not None else None
+            # create the window object and add it to the list
+            windows.append(HeadlessWindow(window_config, station, icon_handler, config, filename, save_interval=save_interval))
+
+        return windows
+
+    def __init__(self, window_config: dict, station: Station, icon_handler: LineIcons, config: Config, filename: str | None = None, number_of_departure_entries: int = 10, save_interval: float = 0):
+        """Creates a window and renders its first (empty) frame
+
+        Args:
+            window_config (dict): The window's config dict
+            station (Station): The station object assigned to this window
+            icon_handler (LineIcons): The Icon handler that creates the icons
+            config (Config): the whole config object
+            filename (str | None, optional): File every frame is saved to as PNG, None to only keep them in memory. Defaults to None.
+            number_of_departure_entries (int, optional): Number of entries to fit onto this screen. Defaults to 10.
+            save_interval (float, optional): Seconds between two saves of a frame whose departure entries and station name didn't change, so that a clock-only change doesn't write a file every second. Frames with changed departure entries or station name are always saved right away. Defaults to 0, which saves every frame.
+        """
+        # set some instance wide variables from the parameters
+        self.station = station
+        self.icon_handler = icon_handler
+        self.config = config
+        self.filename = filename
+        self.number_of_departure_entries = number_of_departure_entries
+        self.save_interval = save_interval
+
+        # time.monotonic() of the last save, None if the frame was never saved
+        self.last_saved: float | None = None
+
+        # set this windows height and width and calculate the sizes of its parts (shared with the Tk backend, see gui_layout.py)
+        self.height = window_config["height"]
+        self.width = window_config["width"]
+        self.layout = WindowLayout.create(self.width, self.height, number_of_departure_entries)
+
+        self.stationname_shown = self.station.name
+
+        # departures currently shown and the time of their last successful update if they are outdated, see tick()
+        self.departures: list[Departure] = []
+        self.outdated_since: datetime | None = None
+
+        # the icon in the top left and the QR-Code (added later, see create_qr_code)
+        stop_icon_size = self.layout.get_stop_icon_size()
+        self.stop_icon = Image.open("images/stop_icon.png").convert("RGBA").resize((stop_icon_size, stop_icon_size))
+        self.qr_code: Image.Image | None = None
+
+        # content of the departure entries rendered (None until the first refresh), the cache keys of their icons and the images of the icons shown
+        self.rows: tuple[DepartureRow, ...] | None = None
+        self.icon_keys: list[tuple | None] = []
+        self.icons: dict[tuple, Image.Image] = {}
+
+        # the frame, only the parts that changed are rendered again onto it
+        self.frame = Image.new("RGB", (self.width, self.height), self.config.colors["departure_entry_lighter"])
+        self.refresh(None)
+
+    def create_qr_code(self, qr_codes: QRCodes):
+        """Adds a QR-Code to the header (if configred in settings)
+
+        Args:
+            qr_codes (QRCodes): QR-Code handler shared by all windows
+        """
+        if self.config.general["QR-Code-content"] is not None and self.config.general["QR-Code-height"] > 0:
+            self.qr_code = qr_codes.get_image(str(self.config.general["QR-Code-content"]), self.layout.get_qr_code_size(self.config.general["QR-Code-height"]), self.config.colors["qr_code_background"], self.config.colors["qr_code_foregreound"])
+            self.render_header(datetime.now())
+            if self.filename is not None:
+                self.save()
+
+    def refresh(self, departures: list[Departure] | tuple[Departure, ...] | None, outdated_since: datetime | None = None):
+        """Refreshes the information of this window with the new specified departures and renders (and saves) a new frame. The departure entries are only rendered again if their content changed, and a frame in which only the clock changed is only saved every save_interval seconds.
+
+        Args:
+            departures (list[Departure] | tuple[Departure, ...] | None): Departures to populate this window with
+            outdated_since (datetime | None, optional): Time of the last successful update, if the departures could not be updated. Defaults to None.
+        """
+        # compute the header text and departure entries (shared with the Tk backend, see gui_layout.py)
+        content = WindowContent.create(self.station.name, departures, outdated_since, self.config.colors, self.config.general["time_zone"], self.number_of_departure_entries)
+        changed = content.rows != self.rows or content.stationname != self.stationname_shown
+        self.stationname_shown = content.stationname
+
+        # remember the departures, so that tick() can count them down without new data
+        self.departures = content.departures
+        self.outdated_since = outdated_since
+
+        # most ticks only change the clock, so the departure entries are only rendered again when they changed
+        if content.rows != self.rows:
+            self.rows = content.rows
+            self.icon_keys = [self._get_icon_key(row.departure) if row.departure is not None else None for row in self.rows]
+
+            # keep the images of the icons shown, render (or load from the atlas) only the new ones
+            icons: dict[tuple, Image.Image] = {}
+            for icon_key in self.icon_keys:
+                if icon_key is not None and icon_key not in icons:
+                    icons[icon_key] = self.icons[icon_key] if icon_key in self.icons else self.icon_handler.render(icon_key)
+            self.icons = icons
+
+            self.render_departure_entries()
+
+        self.render_header(datetime.now())
+        if self.filename is not None and (changed or self.last_saved is None or timer.monotonic() - self.last_saved >= self.save_interval):
+            self.save()
+
+    def _get_icon_key(self, departure: Departure) -> tuple:
+        """Returns the cache key of the line icon of a departure in this window
+
+        Args:
+            departure (Departure): The departure
+
+        Returns:
+            tuple: The cache key (see LineIcons.get_key)
+        """
+        text, icon_width, icon_height, icon_radius = self.layout.get_icon_parameters(departure.line_number)
+        return self.icon_handler.get_key(self.icon_handler.get_shape(departure.mode), icon_width, icon_height, icon_radius, text, departure.background_color, departure.text_color, self.layout.departure_entry_font)
+
+    def tick(self):
+        """Counts down the departures shown without new data and renders a new frame with the current time
+        """
+        self.refresh(self.departures, self.outdated_since)
+
+    def render_header(self, now: datetime):
+        """Renders the header with the stop icon, station name, clock and QR-Code onto the frame
+
+        Args:
+            now (datetime): The time shown by the clock
+        """
+        layout = self.layout
+        colors = self.config.colors
+        fonts = self.icon_handler.fonts
+
+        # Tk font sizes are drawn as pixel sizes, just like in the line icons
+        header_font = fonts.get_font(layout.header_font[1])
+        draw = ImageDraw.Draw(self.frame)
+
+        # stop icon and station name on the left and the clock and QR-Code on the right
+        center = layout.header_height / 2
+        draw.rectangle((0, 0, self.width, layout.header_height - 1), fill=colors["header_background"])
+        self.frame.paste(self.stop_icon, (layout.padding_size, int(center - self.stop_icon.height / 2)), self.stop_icon)
+        draw.text((2 * layout.padding_size + self.stop_icon.width, center), self.stationname_shown, font=header_font, fill=colors["header_text"], anchor="lm")
+
+        clock = now.strftime('%H:%M:%S')
+        draw.text((self.width - layout.padding_size, center), clock, font=header_font, fill=colors["header_text"], anchor="rm")
+        if self.qr_code is not None:
+            # the QR-Code is centered in a square as high as the header, just left of the clock
+            square_right = self.width - 2 * layout.padding_size - fonts.get_text_size(clock, layout.header_font[1])[0]
+            self.frame.paste(self.qr_code, (int(square_right - center - self.qr_code.width / 2), int(center - self.qr_code.height / 2)))
+
+    def render_departure_entries(self):
+        """Renders the departure entry header (column description) and the departure entries currently shown onto the frame
+        """
+        layout = self.layout
+        colors = self.config.colors
+        fonts = self.icon_handler.fonts
+
+        # Tk font sizes are drawn as pixel sizes, just like in the line icons
+        column_header_font = fonts.get_font(layout.column_header_font[1])
+        departure_entry_font = fonts.get_font(layout.departure_entry_font[1])
+        draw = ImageDraw.Draw(self.frame)
+
+        # departure entry header for column description
+        top = layout.header_height
+        height = layout.column_header_height
+        center = top + int(height) / 2
+        text_color = colors["departure_entry_text"]
+        draw.rectangle((0, top, self.width, top + int(height) - 1), fill=colors["departure_entry_darker"])
+        draw.text((2 * height, center), "Linie", font=column_header_font, fill=text_color, anchor="mm")
+        draw.text((4 * height, center), "Richtung", font=column_header_font, fill=text_color, anchor="lm")
+        draw.text((0.8 * self.width, center), "Gleis / Bstg.", font=column_header_font, fill=text_color, anchor="mm")
+        draw.text((self.width - layout.column_header_padding, center), "Ankunft", font=column_header_font, fill=text_color, anchor="rm")
+
+        # departure entries, the space below the last one keeps the background of the frame
+        top += int(height)
+        height = layout.departure_entry_height
+        draw.rectangle((0, top, self.width, self.height), fill=colors["departure_entry_lighter"])
+        for row, icon_key in zip(self.rows, self.icon_keys):
+            center = top + height / 2
+            draw.rectangle((0, top, self.width, top + height - 1), fill=row.background)
+            if icon_key is not None:
+                icon = self.icons[icon_key]
+                self.frame.paste(icon, (int(height - icon.width / 2), int(center - icon.height / 2)), icon)
+            draw.text((2 * height, center), row.destination, font=departure_entry_font, fill=text_color, anchor="lm")
+            draw.text((0.8 * self.width, center), row.platform, font=departure_entry_font, fill=text_color, anchor="mm")
+            draw.text((self.width - layout.departure_entry_padding, center), row.time, font=departure_entry_font, fill=text_color, anchor="rm")
+            top += height
+
+    def save(self):
+        """Saves the frame as PNG
+        """
+        try:
+            atomic_write(self.filename, lambda f: self.frame.save(f, format="PNG", compress_level=1))
+            self.last_saved = timer.monotonic()
+        except OSError:
+            logger.warning(f'Frame "{self.filename}" could not be saved', exc_info=True)
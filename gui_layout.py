@@ -0,0 +1,165 @@
+from dataclasses import dataclass
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from data_classes import Departure
+from helper_functions import get_next_departures, get_departure_time_text, get_platform_text
+
+
+@dataclass(frozen=True)
+class WindowLayout:
+    """Class for the sizes of all parts of a window, computed once from the window's size and shared by all render backends (see gui.py and gui_headless.py)
+    """
+    width: int
+    height: int
+    number_of_departure_entries: int
+    header_height: int
+    padding_size: int
+    header_font: tuple[str, int]
+    departure_entry_height: int
+    departure_entry_padding: int
+    departure_entry_font: tuple[str, int]
+    column_header_height: float # the departure entry header (column description) is only half as high as a departure entry
+    column_header_padding: int
+    column_header_font: tuple[str, int]
+
+    @staticmethod
+    def create(width: int, height: int, number_of_departure_entries: int = 10) -> "WindowLayout":
+        """Computes the layout of a window
+
+        Args:
+            width (int): Width of the window in pixels
+            height (int): Height of the window in pixels
+            number_of_departure_entries (int, optional): Number of entries to fit onto this screen. Defaults to 10.
+
+        Returns:
+            WindowLayout: The layout
+        """
+        # calculate header and departure entry sizes
+        header_height = int(height / 12)
+        departure_frame_height = height - header_height
+        departure_entry_height = int(((departure_frame_height) / (number_of_departure_entries * 2 + 1)) * 2) # +1 for departure entry header (column description)
+        departure_entry_font = ("liberation sans", int(height / 25))
+        column_header_height = departure_entry_height / 2
+
+        return WindowLayout(width=width,
+                            height=height,
+                            number_of_departure_entries=number_of_departure_entries,
+                            header_height=header_height,
+                            padding_size=int(height / 75),
+                            header_font=("liberation sans", int(height / 25)),
+                            departure_entry_height=departure_entry_height,
+                            departure_entry_padding=int(departure_entry_height / 8),
+                            departure_entry_font=departure_entry_font,
+                            column_header_height=column_header_height,
+                            column_header_padding=int(column_header_height / 8),
+                            # Use a smaller text size to use up less space
+                            column_header_font=(departure_entry_font[0], int(departure_entry_font[1] / 2)))
+
+    def get_stop_icon_size(self) -> int:
+        """Returns the width and height of the stop icon in the top left
+
+        Returns:
+            int: Size in pixels
+        """
+        return int(self.header_height - 2 * self.padding_size)
+
+    def get_qr_code_size(self, relative_height: float) -> int:
+        """Returns the width and height of the QR-Code in the header
+
+        Args:
+            relative_height (float): Height of the QR-Code relative to the header (see README -> QR-Code-height)
+
+        Returns:
+            int: Size in pixels
+        """
+        return int(self.header_height * relative_height)
+
+    def get_icon_parameters(self, line_number: str) -> tuple[str, int, int, int]:
+        """Returns the text and dimensions of the line icon of a line in a departure entry
+
+        Args:
+            line_number (str): The line number
+
+        Returns:
+            tuple[str, int, int, int]: Tuple of (text, width, height, corner radius) of the icon
+        """
+        # Scalar for general size appearance of icon size
+        icon_scale = 0.8
+
+        # Preprocess line number
+        text = line_number
+        if text == "InterCityExpress": text = "ICE"
+        if text == "InterCity": text = "IC"
+        # Some black magic to make nice icon dimension while being adaptive to line number length
+        icon_width = int(icon_scale * (self.departure_entry_height * (text.__len__()*0.4) + 2.5 * self.departure_entry_padding))
+        icon_height = int(icon_scale * (self.departure_entry_height - 2* self.departure_entry_padding))
+
+        return text, icon_width, icon_height, int((icon_height) / 4)
+
+
+@dataclass(frozen=True)
+class DepartureRow:
+    """Class for the content of a single departure entry, shared by all render backends
+    """
+    background: str
+    departure: Departure | None # None for an empty departure entry
+    destination: str
+    platform: str
+    time: str
+
+
+@dataclass(frozen=True)
+class WindowContent:
+    """Class for everything a window shows except for the clock, computed on every refresh and shared by all render backends (see gui.py and gui_headless.py)
+    """
+    stationname: str
+    departures: list[Departure] # all departures that have not passed yet, so that they can be counted down without new data
+    rows: tuple[DepartureRow, ...]
+
+    @staticmethod
+    def create(station_name: str,
+               departures: list[Departure] | tuple[Departure, ...] | None,
+               outdated_since: datetime | None,
+               colors: dict,
+               time_zone: str,
+               number_of_departure_entries: int = 10) -> "WindowContent":
+        """Computes the content of a window
+
+        Args:
+            station_name (str): Name of the window's station
+            departures (list[Departure] | tuple[Departure, ...] | None): Departures to populate the window with
+            outdated_since (datetime | None): Time of the last successful update, if the departures could not be updated
+            colors (dict): The colors config section
+            time_zone (str): the applicable timezone
+            number_of_departure_entries (int, optional): Number of entries on the window. Defaults to 10.
+
+        Returns:
+            WindowContent: The content
+        """
+        # show the age of the departures in the header, if they could not be updated
+        if outdated_since is None:
+            stationname = station_name
+        else:
+            stationname = f"{station_name} (Stand {outdated_since.strftime('%H:%M')})"
+
+        # no departures at all clear every departure entry
+        if departures is None:
+            departures = []
+
+        # drop all departures that have already passed and select the next ones to show by their estimated time if available. if not, fall back to their planned time
+        now = datetime.now().replace(tzinfo=ZoneInfo(time_zone))
+        upcoming, next_departures = get_next_departures(departures, now, number_of_departure_entries)
+
+        # alternate the background of the departure entries, the ones left over keep the background of the last one filled
+        rows: list[DepartureRow] = []
+        for i in range(number_of_departure_entries):
+            if i < len(next_departures):
+                departure = next_departures[i]
+                background = colors["departure_entry_darker"] if i % 2 else colors["departure_entry_lighter"]
+                rows.append(DepartureRow(background, departure, departure.destination, get_platform_text(departure), get_departure_time_text(departure, time_zone)))
+            else:
+                background = colors["departure_entry_darker"] if (len(next_departures) - 1) % 2 else colors["departure_entry_lighter"]
+                rows.append(DepartureRow(background, None, "", "", ""))
+
+        return WindowContent(stationname, upcoming, tuple(rows))
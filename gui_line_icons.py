@@ -1,14 +1,182 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import queue
+import shutil
+import threading
 from PIL import Image, ImageDraw, ImageFont, ImageTk
-from typing import Literal
+from typing import Callable, Literal
+
+from helper_functions import atomic_write
+from log import logger
+
+
+class FontManager:
+    """Class for a font handler that loads every font size only once and memoizes text measurements
+    """
+    def __init__(self, path: str = "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"):
+        """Init the caches
+
+        Args:
+            path (str, optional): Path of the TrueType font file. Defaults to "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf".
+        """
+        self.path = path
+        self._fonts: dict[int, ImageFont.FreeTypeFont | ImageFont.ImageFont] = {}
+        self._text_sizes: dict[tuple[str, int], tuple[int, int]] = {}
+    
+    def get_font(self, size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+        """Returns the font in the given size, loading it only on first use
+
+        Args:
+            size (int): Font size
+
+        Returns:
+            ImageFont.FreeTypeFont | ImageFont.ImageFont: The font
+        """
+        if size not in self._fonts:
+            try:
+                self._fonts[size] = ImageFont.truetype(self.path, size)
+            except OSError:
+                # e.g. on machines without the font installed, use Pillow's default font, but in the same size
+                try:
+                    self._fonts[size] = ImageFont.load_default(size)
+                except TypeError:
+                    # Pillow before 10.1 only has the default font in a single size
+                    self._fonts[size] = ImageFont.load_default()
+        return self._fonts[size]
+    
+    def get_text_size(self, text: str, size: int) -> tuple[int, int]:
+        """Returns the width of the text's bounding box and the total height (ascent + descent) of the font, measuring them only on first use
+
+        Args:
+            text (str): The text to measure
+            size (int): Font size
+
+        Returns:
+            tuple[int, int]: Tuple of (width, height) of the textbox
+        """
+        key = (text, size)
+        if key not in self._text_sizes:
+            pil_font = self.get_font(size)
+            
+            # Get the ascent and descent of the font to calculate the vertical centering
+            ascent, descent = pil_font.getmetrics()
+            
+            # Calculate the bounding box of the text to center it horizontally
+            bbox = pil_font.getbbox(text)
+            
+            self._text_sizes[key] = (bbox[2] - bbox[0], ascent + descent)
+        return self._text_sizes[key]
+
+
+class IconAtlas:
+    """Class for an on-disk atlas of rendered line icons, so that restarts don't have to render them again. The icons are kept in a subdirectory per hash of the line color data, so changed colors never show up with old icons.
+    """
+    def __init__(self, directory: str, data_hash: str):
+        """Creates the atlas
+
+        Args:
+            directory (str): Directory the atlas is kept in
+            data_hash (str): Hash of the current line color data (see LineColors.get_hash)
+        """
+        self.parent_directory = directory
+        self.data_hash = data_hash
+        self.directory = os.path.join(directory, data_hash)
+    
+    def prune(self):
+        """Deletes the icons of all other line color data
+        """
+        if os.path.isdir(self.parent_directory):
+            for entry in os.listdir(self.parent_directory):
+                if entry != self.data_hash and os.path.isdir(os.path.join(self.parent_directory, entry)):
+                    shutil.rmtree(os.path.join(self.parent_directory, entry), ignore_errors=True)
+    
+    def _get_filename(self, key: tuple) -> str:
+        """Returns the file name of an icon
+
+        Args:
+            key (tuple): The icon's cache key
+
+        Returns:
+            str: The file name
+        """
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".png")
+    
+    def load(self, key: tuple) -> Image.Image | None:
+        """Loads an icon from the atlas
+
+        Args:
+            key (tuple): The icon's cache key
+
+        Returns:
+            Image.Image | None: The icon, None if it is not in the atlas (or can't be read)
+        """
+        try:
+            with Image.open(self._get_filename(key)) as img:
+                img.load()
+                return img
+        except FileNotFoundError:
+            return None
+        except OSError:
+            logger.warning(f"Icon {self._get_filename(key)} could not be read from the atlas", exc_info=True)
+            return None
+    
+    def save(self, key: tuple, img: Image.Image):
+        """Saves an icon to the atlas
+
+        Args:
+            key (tuple): The icon's cache key
+            img (Image.Image): The icon
+        """
+        filename = self._get_filename(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            atomic_write(filename, lambda f: img.save(f, format="PNG"))
+        except OSError:
+            logger.warning(f"Icon {filename} could not be saved to the atlas", exc_info=True)
 
 
 class LineIcons:
     """Class for a line icon handler that creates and caches line icons
     """    
-    def __init__(self):
+    # Mode of transport -> shape of its icons, the icons of all other modes are hexagons
+    mode_shapes: dict[str, str] = {
+        "rail": "rounded",
+        "tram": "square",
+        "bus": "banner",
+    }
+    
+    def __init__(self, max_icons: int = 512, max_bytes: int = 32 * 1024 * 1024, fonts: FontManager | None = None):
         """Init the cache
+
+        Args:
+            max_icons (int, optional): Maximum number of icons kept in the cache. Defaults to 512.
+            max_bytes (int, optional): Maximum number of bytes the pixels of all cached icons may take up. Defaults to 32 MiB.
+            fonts (FontManager | None, optional): Font handler used to draw the line numbers, None for a new one. Defaults to None.
         """        
-        self.icon_cache: dict[str, ImageTk.PhotoImage] = {}
+        self.fonts = fonts if fonts is not None else FontManager()
+        
+        self.max_icons = max_icons
+        self.max_bytes = max_bytes
+        
+        # cache key -> (icon, size of its pixels in bytes), ordered from least to most recently used
+        self.icon_cache: OrderedDict[tuple, tuple[ImageTk.PhotoImage, int]] = OrderedDict()
+        self.cache_bytes = 0
+        
+        # statistics about the cache
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        # optional on-disk atlas of rendered icons, see set_atlas
+        self.atlas: IconAtlas | None = None
+        
+        # the fonts are shared between the Tk thread and the warm up thread, so only one of them renders at a time
+        self._render_lock = threading.Lock()
+        self._warm_up_executor: ThreadPoolExecutor | None = None
+        # (cache key, rendered icon) pairs of the warm up, waiting for their conversion to PhotoImages on the Tk thread
+        self._prerendered: queue.Queue[tuple[tuple, Image.Image]] = queue.Queue()
 
     def get_icon(self,
                  mode: Literal["all", "unknown", "air", "bus", "trolleyBus", "tram", "coach", "rail", "intercityRail", "urbanRail", "metro", "water", "cable-way", "funicular", "taxi"],
@@ -37,23 +205,183 @@ class LineIcons:
             ImageTk.PhotoImage: returns the requested icon
         """ 
         
+        # return icon from cache if an icon with exactly these parameters already exists
+        key = self.get_key(self.get_shape(mode), width, height, radius, text, icon_color, text_color, font, padding_height_ratio)
+        if key in self.icon_cache:
+            self.hits += 1
+            self.icon_cache.move_to_end(key)
+            return self.icon_cache[key][0]
+
+        # else, create a new icon, save it to the cache and return it
+        self.misses += 1
+        img = self.render(key)
+        photo = ImageTk.PhotoImage(img)
+        self._add_to_cache(key, photo, img.width * img.height * 4)
+        return photo
+    
+    def get_shape(self, mode: str) -> Literal["rounded", "square", "banner", "hexagon"]:
+        """Returns the shape of the icons of a mode of transport
+
+        Args:
+            mode (str): Mode of transport (see get_icon)
+
+        Returns:
+            Literal["rounded", "square", "banner", "hexagon"]: The shape
+        """
+        return self.mode_shapes.get(mode, "hexagon")
+    
+    def get_key(self,
+                shape: Literal["rounded", "square", "banner", "hexagon"],
+                width: int,
+                height: int,
+                radius: int,
+                text: str,
+                icon_color: str,
+                text_color: str,
+                font,
+                padding_height_ratio: float = None) -> tuple:
+        """Returns the cache key of an icon with the given parameters (see get_icon). The key contains the icon's shape instead of the mode of transport, so that all modes with the same shape share their icons.
+
+        Returns:
+            tuple: The cache key, containing everything the rendered icon depends on
+        """
         if padding_height_ratio is None:
             padding_height_ratio = 1 / 7
         
-        padding = int(height * padding_height_ratio)       
+        padding = int(height * padding_height_ratio)
+        
+        return (shape, width, height, radius, padding, text, icon_color, text_color, tuple(font))
+    
+    def set_atlas(self, atlas: IconAtlas | None):
+        """Sets the on-disk atlas icons are loaded from before they are rendered and saved to after
 
-        # return icon from cache if icon for this line already exists
-        if text in self.icon_cache:
-            return self.icon_cache[text]
+        Args:
+            atlas (IconAtlas | None): The atlas, None to not use one
+        """
+        self.atlas = atlas
+    
+    def open_atlas(self, directory: str, get_data_hash: Callable[[], str]):
+        """Opens the atlas for the current line color data and deletes the icons of all other line color data in the warm up thread, so that the Tk thread doesn't wait for the disk. Icons warmed up afterwards already use the new atlas.
 
-        # else, create a new icon, save it to the cache and return it
-        img = self._create_icon(mode, width, height, padding, radius, text, icon_color, text_color, font)
-        photo = ImageTk.PhotoImage(img)
-        self.icon_cache[text] = photo
-        return photo
+        Args:
+            directory (str): Directory the atlas is kept in
+            get_data_hash (Callable[[], str]): Returns the hash of the current line color data (see LineColors.get_hash)
+        """
+        def open_and_prune():
+            try:
+                atlas = IconAtlas(directory, get_data_hash())
+                self.set_atlas(atlas)
+                atlas.prune()
+            except Exception:
+                logger.exception(f'Icon atlas "{directory}" could not be opened')
+        
+        self._get_warm_up_executor().submit(open_and_prune)
+    
+    def render(self, key: tuple) -> Image.Image:
+        """Returns the image of an icon, loaded from the atlas if it's in there, else rendered (and saved to the atlas). Safe to be called from any thread.
+
+        Args:
+            key (tuple): The icon's cache key (see get_key)
+
+        Returns:
+            Image.Image: Image of the icon
+        """
+        atlas = self.atlas
+        if atlas is not None:
+            img = atlas.load(key)
+            if img is not None:
+                return img
+        
+        shape, width, height, radius, padding, text, icon_color, text_color, font = key
+        with self._render_lock:
+            img = self._create_icon(shape, width, height, padding, radius, text, icon_color, text_color, font)
+        
+        if atlas is not None:
+            atlas.save(key, img)
+        return img
+    
+    def warm_up(self, keys: list[tuple]):
+        """Renders the given icons in a background thread, so that the first refresh doesn't have to. Call install_prerendered on the Tk thread to move them into the cache.
+
+        Args:
+            keys (list[tuple]): Cache keys of the icons to render (see get_key)
+        """
+        def render_all(keys: list[tuple]):
+            for key in keys:
+                try:
+                    self._prerendered.put((key, self.render(key)))
+                except Exception:
+                    logger.exception(f"Icon {key} could not be prerendered")
+        
+        self._get_warm_up_executor().submit(render_all, [key for key in dict.fromkeys(keys) if key not in self.icon_cache])
+    
+    def _get_warm_up_executor(self) -> ThreadPoolExecutor:
+        """Returns the executor of the warm up thread, creating it on first use. It has a single thread, so its jobs run in the order they were submitted.
+
+        Returns:
+            ThreadPoolExecutor: The executor
+        """
+        if self._warm_up_executor is None:
+            self._warm_up_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="IconWarmUp")
+        return self._warm_up_executor
+    
+    def install_prerendered(self, max_count: int = 20) -> int:
+        """Converts icons rendered by the warm up to PhotoImages and adds them to the cache. Has to be called on the Tk thread.
+
+        Args:
+            max_count (int, optional): Maximum number of icons to convert in this call, so that the Tk thread is never blocked for long. Defaults to 20.
+
+        Returns:
+            int: Number of icons added to the cache
+        """
+        installed = 0
+        while installed < max_count:
+            try:
+                key, img = self._prerendered.get_nowait()
+            except queue.Empty:
+                break
+            
+            # an icon already rendered on demand in the meantime is kept, and the warm up never evicts icons from a full cache
+            if key in self.icon_cache or len(self.icon_cache) >= self.max_icons or self.cache_bytes + img.width * img.height * 4 > self.max_bytes:
+                continue
+            
+            self._add_to_cache(key, ImageTk.PhotoImage(img), img.width * img.height * 4)
+            installed += 1
+        
+        return installed
+    
+    def _add_to_cache(self, key: tuple, photo: ImageTk.PhotoImage, size: int):
+        """Adds an icon to the cache and evicts the least recently used ones while the cache is over its limits
+
+        Args:
+            key (tuple): The icon's cache key
+            photo (ImageTk.PhotoImage): The icon
+            size (int): Size of the icon's pixels in bytes
+        """
+        self.icon_cache[key] = (photo, size)
+        self.cache_bytes += size
+        
+        # always keep the newest icon, even if it alone is over the limits
+        while len(self.icon_cache) > 1 and (len(self.icon_cache) > self.max_icons or self.cache_bytes > self.max_bytes):
+            _, (_, evicted_size) = self.icon_cache.popitem(last=False)
+            self.cache_bytes -= evicted_size
+            self.evictions += 1
+    
+    def invalidate_lines(self, line_names: set[str]):
+        """Removes the icons of the given lines from the cache, e.g. because their colors changed. The icons of all other lines are kept.
+
+        Args:
+            line_names (set[str]): Names of the lines whose icons are removed
+        """
+        for key in list(self.icon_cache.keys()):
+            text = key[5]
+            # "SEV" lines might use the colors of the line they are replacing
+            if text in line_names or (text.startswith("SEV") and text[3:] in line_names):
+                _, size = self.icon_cache.pop(key)
+                self.cache_bytes -= size
 
     def _create_icon(self,
-                     mode,
+                     shape,
                      width,
                      height,
                      padding,
@@ -62,10 +390,10 @@ class LineIcons:
                      icon_color,
                      text_color,
                      font) -> Image:
-        """This function decides, which shape the icon is going to have based on mode of transport
+        """This function creates the icon in the given shape
 
         Args:
-            mode (Literal["all", "unknown", "air", "bus", "trolleyBus", "tram", "coach", "rail", "intercityRail", "urbanRail", "metro", "water", "cablee-way", "funicular", "taxi"]): Mode of transport of the line
+            shape (Literal["rounded", "square", "banner", "hexagon"]): Shape of the icon (see get_shape)
             width (int): width of the icon
             height (int): height of the icon
             padding (int): padding between text and icon border
@@ -79,11 +407,11 @@ class LineIcons:
             Image: Image of the created icon
         """
 
-        if mode == "rail":
+        if shape == "rounded":
             return self._create_rounded_label(width, height, padding, radius, text, icon_color, text_color, font)
-        elif mode == "tram":
+        elif shape == "square":
             return self._create_square_label(width, height, padding, text, icon_color, text_color, font)
-        elif mode == "bus":
+        elif shape == "banner":
             return self._create_banner_label(width, height, padding, text, icon_color, text_color, font)
         else:
             return self._create_hexagon_label(width, height, padding, text, icon_color, text_color, font)
@@ -103,7 +431,7 @@ class LineIcons:
         
         return img, ImageDraw.Draw(img)
 
-    def _draw_text_centered(self, draw: ImageDraw, text: str, font, fill, width: int = 0, height: int = 0) -> tuple[str, str]:
+    def _draw_text_centered(self, draw: ImageDraw, text: str, font, fill, width: int = 0, height: int = 0) -> tuple[int, int]:
         """Draws the given text to the image and returns the text box height and width
 
         Args:
@@ -113,33 +441,21 @@ class LineIcons:
             fill: THe text color to use
 
         Returns:
-            tuple[str, str]: Tuple of (width, height) of the drawn textbox
+            tuple[int, int]: Tuple of (width, height) of the drawn textbox
         """        
-        try:
-            pil_font = ImageFont.truetype("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", font[1])
-        except:
-            pil_font = ImageFont.load_default()
-
-        # Get the ascent and descent of the font to calculate the vertical centering
-        ascent, descent = pil_font.getmetrics()
-        # Total font height
-        total_height = ascent + descent
-
-        # Calculate the bounding box of the text to center it horizontally
-        bbox = draw.textbbox((0, 0), text, font=pil_font)
-        text_width = bbox[2] - bbox[0]
+        text_width, total_height = self.fonts.get_text_size(text, font[1])
 
         # Calculate the x and y position to center the text
         x = (width - text_width) / 2
         y = (height - total_height) / 2
 
-        draw.text((x, y), text, font=pil_font, fill=fill)
+        draw.text((x, y), text, font=self.fonts.get_font(font[1]), fill=fill)
         
         return text_width, total_height
 
-    def _get_width_and_height(self, width, height, padding, text, font, text_color):
-        # draw text box
-        text_width, text_height = self._draw_text_centered(ImageDraw.Draw(Image.new("RGBA", (width, height), (0, 0, 0, 0))), text, font, text_color)
+    def _get_width_and_height(self, width, height, padding, text, font):
+        # measure text box
+        text_width, text_height = self.fonts.get_text_size(text, font[1])
         width = text_width + 2 * padding
         height = text_height + padding
         
@@ -154,7 +470,7 @@ class LineIcons:
     # The following methods create the different shapes of icons
 
     def _create_rounded_label(self, width, height, padding, radius, text, icon_color, text_color, font) -> Image:
-        width, height = self._get_width_and_height(width, height, padding, text, font, text_color)
+        width, height = self._get_width_and_height(width, height, padding, text, font)
         img, draw = self._create_base_image_draw(width, height)
 
         # create two overlapping center rectangles
@@ -170,7 +486,7 @@ class LineIcons:
         return img
 
     def _create_square_label(self, width, height, padding, text, icon_color, text_color, font) -> Image:
-        width, height = self._get_width_and_height(width, height, padding, text, font, text_color)
+        width, height = self._get_width_and_height(width, height, padding, text, font)
         img, draw = self._create_base_image_draw(width, height)
         
         # create one single rectangle
@@ -180,7 +496,7 @@ class LineIcons:
         return img
 
     def _create_hexagon_label(self, width, height, padding, text, icon_color, text_color, font) -> Image:
-        width, height = self._get_width_and_height(width, height, padding, text, font, text_color)
+        width, height = self._get_width_and_height(width, height, padding, text, font)
         width = max(int(width), int(height * 5 / 4))
         img, draw = self._create_base_image_draw(width, height)
 
@@ -199,7 +515,7 @@ class LineIcons:
         return img
 
     def _create_banner_label(self, width, height, padding, text, icon_color, text_color, font) -> Image:
-        width, height = self._get_width_and_height(width, height, padding, text, font, text_color)
+        width, height = self._get_width_and_height(width, height, padding, text, font)
         width = max(int(width), int(height * 5 / 4))
         img, draw = self._create_base_image_draw(width + 2*padding, height)
 
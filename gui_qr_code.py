@@ -0,0 +1,83 @@
+from PIL import Image, ImageColor, ImageTk
+
+
+class QRCodes:
+    """Class for a QR-Code handler that encodes every content only once and keeps the images of every size, so all windows showing the same QR-Code share them
+    """
+    def __init__(self, quiet_zone: int = 2):
+        """Init the caches
+
+        Args:
+            quiet_zone (int, optional): Width of the empty border around the QR-Code in modules. Defaults to 2.
+        """
+        self.quiet_zone = quiet_zone
+
+        # content -> module matrix (rows of 1 for dark and 0 for light modules, including the quiet zone)
+        self._matrices: dict[str, tuple[bytes, ...]] = {}
+        # (content, size, background, foreground) -> image
+        self._images: dict[tuple[str, int, str, str], Image.Image] = {}
+        self._photo_images: dict[tuple[str, int, str, str], ImageTk.PhotoImage] = {}
+
+    def get_matrix(self, content: str) -> tuple[bytes, ...]:
+        """Returns the module matrix of a QR-Code, encoding the content only on first use
+
+        Args:
+            content (str): Content to be encoded in the QR-Code
+
+        Returns:
+            tuple[bytes, ...]: Rows of the matrix, 1 for dark and 0 for light modules, including the quiet zone
+        """
+        if content not in self._matrices:
+            # pyqrcode is only imported when a QR-Code is actually needed, so it doesn't slow down the startup
+            import pyqrcode
+
+            code = pyqrcode.create(content).code
+            width = len(code) + 2 * self.quiet_zone
+            empty_rows = [bytes(width)] * self.quiet_zone
+            border = bytes(self.quiet_zone)
+            self._matrices[content] = tuple(empty_rows + [border + bytes(row) + border for row in code] + empty_rows)
+
+        return self._matrices[content]
+
+    def get_image(self, content: str, size: int, background: str, foreground: str) -> Image.Image:
+        """Returns the image of a QR-Code, creating it only on first use
+
+        Args:
+            content (str): Content to be encoded in the QR-Code
+            size (int): Width and height of the image in pixels
+            background (str): Background color hex code
+            foreground (str): Foreground (module) color hex code
+
+        Returns:
+            Image.Image: The image
+        """
+        key = (content, size, background, foreground)
+
+        if key not in self._images:
+            matrix = self.get_matrix(content)
+
+            # one pixel per module, colored by the palette, then scaled up without blurring the module edges
+            image = Image.frombytes("P", (len(matrix), len(matrix)), b"".join(matrix))
+            image.putpalette(ImageColor.getrgb(background) + ImageColor.getrgb(foreground))
+            self._images[key] = image.resize((size, size), Image.NEAREST).convert("RGB")
+
+        return self._images[key]
+
+    def get_photo_image(self, content: str, size: int, background: str, foreground: str) -> ImageTk.PhotoImage:
+        """Returns the image of a QR-Code for use in Tk widgets, creating it only on first use
+
+        Args:
+            content (str): Content to be encoded in the QR-Code
+            size (int): Width and height of the image in pixels
+            background (str): Background color hex code
+            foreground (str): Foreground (module) color hex code
+
+        Returns:
+            ImageTk.PhotoImage: The image
+        """
+        key = (content, size, background, foreground)
+
+        if key not in self._photo_images:
+            self._photo_images[key] = ImageTk.PhotoImage(self.get_image(content, size, background, foreground))
+
+        return self._photo_images[key]
@@ -2,16 +2,45 @@ from typing import TYPE_CHECKING
 # Only for typechecking to prevent a circular import but still be able to use the Window type setting
 if TYPE_CHECKING:
     from gui import Window
+    from gui_line_icons import LineIcons
+    from line_colors import LineColors
 from data_classes import Station, StopPoint, Departure
 from log import logger
+from station_index import StationIndex
 
 from datetime import datetime, timedelta
-import pandas as pd
-from urllib.request import urlretrieve
-from urllib.error import HTTPError
+import hashlib
+import heapq
+import json
+import os
+from operator import attrgetter
+import sys
+from typing import BinaryIO, Callable, Iterable, Literal
 import xml.etree.ElementTree as ET
 from zoneinfo import ZoneInfo
 
+def atomic_write(filename: str, write: Callable[[BinaryIO], None]):
+    """Writes a file by writing it to a temporary file next to it first and then replacing the file with it in one step, so that nobody ever reads a half written file and a crash never leaves one behind
+
+    Args:
+        filename (str): The file to write
+        write (Callable[[BinaryIO], None]): Function writing the content to the (binary) file it is given
+
+    Raises:
+        OSError: If the file could not be written. The temporary file is removed again.
+    """
+    tmp_filename = filename + ".tmp"
+    try:
+        with open(tmp_filename, "wb") as f:
+            write(f)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+
 def create_stations(stations_config: dict) -> list[Station]:
     """Create station objects from stations config
 
@@ -82,68 +111,94 @@ def get_all_used_stoppoints(windows: list["Window"]) -> list[StopPoint]:
     
     return all_stop_points
     
-def download_line_color_list(filename: str) -> bool:
-    """Downloads the latest line color codes for later use in icon creation and saves the file to the specified filename
+def get_icon_warm_up_keys(windows: list["Window"], line_colors: "LineColors", icon_handler: "LineIcons", line_names: set[str] | None = None) -> list[tuple]:
+    """Returns the cache keys of the icons of all lines in the line color data at every window's icon size, for prerendering them (see LineIcons.warm_up)
 
     Args:
-        filename (str): filename to save the file as
+        windows (list[Window]): List of windows (of any render backend) whose icon sizes are used
+        line_colors (LineColors): The line color registry whose lines are used
+        icon_handler (LineIcons): The icon handler the keys are created for
+        line_names (set[str] | None, optional): Only use these lines instead of all lines in the line color data. Defaults to None.
 
     Returns:
-        bool: True, if the data could be downloaded successfully
-    """    
-    #TODO: change to use official kvv data
-    #TODO: make argument instead of hardcoded url
+        list[tuple]: list of all cache keys
+    """
+    # take a reference to the current index, so the colors and shapes of all keys come from the same line color data
+    index = line_colors.index
+    if line_names is None:
+        line_names = index.colors.keys()
     
-    # try to donwload from url
-    url = "https://raw.githubusercontent.com/Traewelling/line-colors/refs/heads/main/line-colors.csv"
-    try:
-        # downloads url content to the specified filename
-        urlretrieve(url, filename)
-        return True
-    except HTTPError:
-        logger.exception("Line color data could not be downloaded!y")
-        return False
-
-def get_line_color(line_name: str, filename: str, fallback_colors: tuple[str, str], SEV_lines_use_normal_line_icon_colors: bool) -> tuple[str, str]:
-    """Returns a tuple of two strings containing color hex codes for background and text color for line icon creation. Sets ICs and ICEs to DB-red color and FLXs to FLX-green color.
+    keys: list[tuple] = []
+    for window in windows:
+        # all departure entries of a window (except for the header) share the same icon size
+        for line_name in line_names:
+            text, icon_width, icon_height, icon_radius = window.layout.get_icon_parameters(line_name)
+            background_color, text_color = line_colors.get(line_name, index)
+            # the actual mode of transport is only known from the API, so use the icon shape in the line color data
+            shape = index.shapes.get(line_name, "hexagon")
+            keys.append(icon_handler.get_key(shape, icon_width, icon_height, icon_radius, text, background_color, text_color, window.layout.departure_entry_font))
+    
+    return keys
+    
+def download_line_color_list(filename: str,
+                             url: str = "https://raw.githubusercontent.com/Traewelling/line-colors/refs/heads/main/line-colors.csv",
+                             timeout: float = 30) -> Literal["updated", "unchanged", "failed"]:
+    """Downloads the latest line color codes for later use in icon creation and saves the file to the specified filename. The request is conditional: the validators (ETag and Last-Modified) of the last download are kept next to the file, so that the data is only transferred again if it changed. The file is replaced atomically, so nobody ever reads a half written file.
 
     Args:
-        line_name (str): Name of the Line
-        filename (str): File location of the line color data
-        fallback_colors (tuple[str, str]): colors to use if line is not to be found in the file
-        SEV_lines_use_normal_line_icon_colors (bool): whether or not "SEV" lines should use their normal lines colors (see README -> general configuration)
+        filename (str): filename to save the file as
+        url (str, optional): url to download the data from. Defaults to the Träwelling line colors.
+        timeout (float, optional): Seconds to wait for the server. Defaults to 30.
 
     Returns:
-        tuple[str, str]: tuple of (backgroundcolor, textcolor) in hex code
-    """
+        Literal["updated", "unchanged", "failed"]: "updated" if new data was downloaded, "unchanged" if the file is still up to date and "failed" if the data could not be downloaded
+    """    
+    #TODO: change to use official kvv data
+    # urllib.request is only imported when the data is actually downloaded, so it doesn't slow down the startup
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError, URLError
     
-    # Filter out preset colors for superregional train lines
-    if line_name.startswith("ICE") or line_name.startswith("IC"):
-        return ("#EC0016", "#FFFFFF")
-    if line_name.startswith("FLX"):
-        return ("#97d700", "#FFFFFF")
+    validators_filename = filename + ".validators.json"
     
-    # reads in the data and filters the lines for lines by kvv
-    df = pd.read_csv(filename)
-    filtered_df = df[df['shortOperatorName'].str.contains('kvv', case=False, na=False)]
+    # only use the validators if they belong to the file as it is now (it might have been replaced by hand or by git)
+    headers = {}
+    try:
+        with open(validators_filename, "r", encoding="utf-8") as f:
+            validators = json.load(f)
+        with open(filename, "rb") as f:
+            if validators.get("sha1") == hashlib.sha1(f.read()).hexdigest():
+                if validators.get("etag"):
+                    headers["If-None-Match"] = validators["etag"]
+                if validators.get("last_modified"):
+                    headers["If-Modified-Since"] = validators["last_modified"]
+    except (OSError, ValueError):
+        pass
+    
+    # try to download from url
+    try:
+        with urlopen(Request(url, headers=headers), timeout=timeout) as response:
+            data = response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except HTTPError as e:
+        if e.code == 304:
+            return "unchanged"
+        logger.exception("Line color data could not be downloaded!")
+        return "failed"
+    except (URLError, OSError):
+        logger.exception("Line color data could not be downloaded!")
+        return "failed"
     
-    # find the line in the filtered data
-    result = filtered_df[filtered_df["lineName"] == line_name]
-
     try:
-        if result.empty: # If line could not be found
-            if SEV_lines_use_normal_line_icon_colors and line_name[0:3] == "SEV": # Try to search for a SEV's normal line number, if configured to do so
-                result = filtered_df[filtered_df["lineName"] == line_name[3:]]
-                if result.empty:
-                    raise IndexError("Line name not found")
-            else: 
-                raise IndexError("Line name not found")
-        # if line can be found: 
-        return result["backgroundColor"].array[0], result["textColor"].array[0]
-    except IndexError:
-        # return default colors if no line colors could be found
-        return fallback_colors
+        atomic_write(filename, lambda f: f.write(data))
+        validators = {"etag": etag, "last_modified": last_modified, "sha1": hashlib.sha1(data).hexdigest()}
+        atomic_write(validators_filename, lambda f: f.write(json.dumps(validators).encode("utf-8")))
+    except OSError:
+        logger.exception(f'Line color data could not be saved to "{filename}"!')
+        return "failed"
     
+    return "updated"
+
 def get_time_from_now(time: datetime, time_zone: str) -> timedelta:
     """Returns a timedalta of the time between now and "time"
 
@@ -156,6 +211,42 @@ def get_time_from_now(time: datetime, time_zone: str) -> timedelta:
     """    
     return time - datetime.now().replace(tzinfo=ZoneInfo(time_zone))
 
+def get_departure_time_text(departure: Departure, time_zone: str) -> str:
+    """Returns the text shown in the time column of a departure entry: the time left until the departure (estimated time if one is available, otherwise planned time) or that it is cancelled
+
+    Args:
+        departure (Departure): The departure
+        time_zone (str): the applicable timezone
+
+    Returns:
+        str: The text, e.g. "Jetzt", "5 min" or "1 h 10 min"
+    """
+    # get total seconds from now until departure
+    seconds = get_time_from_now(departure.effective_time, time_zone).total_seconds()
+
+    # Format the time string based on remaining seconds
+    if departure.cancelled:
+        return "fällt aus"
+    elif seconds < 60:
+        return "Jetzt"
+    elif seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    else:
+        return f"{int(seconds // 3600)} h {int((seconds % 3600) // 60)} min"
+
+def get_platform_text(departure: Departure) -> str:
+    """Returns the text shown in the platform column of a departure entry, including the prefix and suffix of the departure's stop point
+
+    Args:
+        departure (Departure): The departure
+
+    Returns:
+        str: The text
+    """
+    prefix = departure.stop_point.prefix if departure.stop_point.prefix is not None else ""
+    suffix = departure.stop_point.suffix if departure.stop_point.suffix is not None else ""
+    return (prefix + " " + departure.platform + " " + suffix) if departure.platform is not None else (prefix + " N/A " + suffix)
+
 def format_platform(platform: str) -> str:
     """Removes "Gleis", "Platform", "Bahnsteig" or similiar terms (characters before the first spae) before the platform number.
 
@@ -173,107 +264,186 @@ def format_platform(platform: str) -> str:
     else:
         return platform
 
-def get_departures_from_xml(stop_point_ref: str,
-                            tree: ET.ElementTree, 
-                            all_stations: list[Station], 
-                            fallback_line_icon_colors: tuple[str, str], 
-                            SEV_lines_use_normal_line_icon_colors: bool) -> list["Departure"]:
-    """Returns all the departures as Objects in the given xml response from the Trias API
+def get_next_departures(departures: Iterable[Departure], now: datetime, count: int) -> tuple[list[Departure], list[Departure]]:
+    """Drops the departures that have already passed and selects the next ones with a bounded heap instead of sorting all of them
+
+    Args:
+        departures (Iterable[Departure]): The departures, in any order
+        now (datetime): The current (time zone aware) time
+        count (int): Number of departures to select
 
     Returns:
-        list[Departure]: A list of all the departures
+        tuple[list[Departure], list[Departure]]: All departures that have not passed yet and the next count of them, ordered by their effective time
     """
-    tree_root = tree.getroot()
+    upcoming = [departure for departure in departures if departure.effective_time >= now]
+    return upcoming, heapq.nsmallest(count, upcoming, key=attrgetter("effective_time"))
 
-    # Define namespaces
-    ns = {
-        'tri': 'http://www.vdv.de/trias',
-        'siri': 'http://www.siri.org.uk/siri'
-    }
+def intern_text(text: str | None) -> str | None:
+    """Interns a string, so that all equal strings parsed share one copy
 
-    departures: list[Departure] = []
+    Args:
+        text (str | None): The string, may be None
 
-    # find all StopEvents in the xml tree
-    for event_result in tree_root.findall('.//tri:StopEventResult', ns):
-        if event_result.find('.//tri:StopPointRef', ns).text.startswith(stop_point_ref):
-            event = event_result.find('tri:StopEvent', ns)
-            
-            # Get departure times
-            planned_time = datetime.fromisoformat(event.find('.//tri:ServiceDeparture/tri:TimetabledTime', ns).text)
-            try:
-                estimated_time = datetime.fromisoformat(event.find('.//tri:ServiceDeparture/tri:EstimatedTime', ns).text)
-            except Exception:
-                estimated_time = None
-
-            # Get line name and destination
-            published_line_name = event.find('.//tri:PublishedLineName/tri:Text', ns).text
-            # TODO: make not hardcoded
-            if published_line_name.split(" ")[1] == "SEV":
-                line_number = "SEV" + "".join(published_line_name.split(" ")[-1])
-            elif published_line_name.split(" ")[-1] == "InterCityExpress":
-                line_number = "ICE" + "".join(published_line_name.split(" ")[1:2])
-            elif published_line_name.split(" ")[-1] == "InterCity":
-                line_number = "IC" + "".join(published_line_name.split(" ")[1:2])
-            elif published_line_name.split(" ")[-1] == "Flixbus":
-                line_number = "FLX" + "".join(published_line_name.split(" ")[-1])
-            else: 
-                line_number = published_line_name.split(" ")[-1]
-            destination = event.find('.//tri:DestinationText/tri:Text', ns).text
-            
-            # platform
-            try:
-                platform = format_platform(event.find('.//tri:PlannedBay/tri:Text', ns).text)
-            except AttributeError:
-                platform = None
-            
-            # get stop_point
-            for station in all_stations:
-                for stop_point in station.stop_points:
-                    if stop_point.stop_point_ref == stop_point_ref:
-                        departure_station = station
-                        departure_stop_point = stop_point
-            
-            # mode
-            mode = event.find('.//tri:Mode/tri:PtMode', ns).text
-
-            # Get colors from github table
-            background_color, text_color = get_line_color(line_number, "line-colors.csv", fallback_line_icon_colors, SEV_lines_use_normal_line_icon_colors)
-
-            # Create Departure
-            departure = Departure(
-                line_number=line_number,
-                destination=destination,
-                platform=platform,
-                station=departure_station,
-                stop_point=departure_stop_point,
-                mode=mode,
-                background_color=background_color,
-                text_color=text_color,
-                planned_time=planned_time,
-                estimated_time=estimated_time
-            )
-
-            # Add departure to list
-            departures.append(departure)
+    Returns:
+        str | None: The interned string, None if it was None
+    """
+    return sys.intern(text) if text is not None else None
 
-    return departures
+def get_line_number(published_line_name: str) -> str:
+    """Returns the line number to display from the published line name given by the Trias API, e.g. "S5" from "S-Bahn S5"
+
+    Args:
+        published_line_name (str): The published line name
+
+    Returns:
+        str: The line number
+    """
+    words = published_line_name.split(" ")
+    # TODO: make not hardcoded
+    if words[1] == "SEV":
+        return "SEV" + words[-1]
+    elif words[-1] == "InterCityExpress":
+        return "ICE" + "".join(words[1:2])
+    elif words[-1] == "InterCity":
+        return "IC" + "".join(words[1:2])
+    elif words[-1] == "Flixbus":
+        return "FLX" + words[-1]
+    else: 
+        return words[-1]
+
+# Qualified names of the Trias elements needed to create a departure
+TRIAS_NAMESPACE = "{http://www.vdv.de/trias}"
+STOP_EVENT_RESULT_TAG = TRIAS_NAMESPACE + "StopEventResult"
+
+# Paths of the parts of a StopEventResult the fields of a departure are read from. Only ThisCall is searched for the call's fields, so the calls of a request with IncludePreviousCalls or IncludeOnwardCalls are never mixed up with it.
+THIS_CALL_PATH = f"{TRIAS_NAMESPACE}StopEvent/{TRIAS_NAMESPACE}ThisCall"
+SERVICE_PATH = f"{TRIAS_NAMESPACE}StopEvent/{TRIAS_NAMESPACE}Service"
+
+# tag -> ((child tag, field of the departure), ...) for every element whose (child's) text is needed, within ThisCall and within Service. A child tag of None means the element's own text.
+TEXT_TAG = TRIAS_NAMESPACE + "Text"
+CALL_FIELD_TAGS: dict[str, tuple[tuple[str | None, str], ...]] = {
+    TRIAS_NAMESPACE + "StopPointRef": ((None, "stop_point_ref"),),
+    TRIAS_NAMESPACE + "ServiceDeparture": ((TRIAS_NAMESPACE + "TimetabledTime", "planned_time"),
+                                           (TRIAS_NAMESPACE + "EstimatedTime", "estimated_time")),
+    TRIAS_NAMESPACE + "PlannedBay": ((TEXT_TAG, "platform"),),
+}
+SERVICE_FIELD_TAGS: dict[str, tuple[tuple[str | None, str], ...]] = {
+    TRIAS_NAMESPACE + "PublishedLineName": ((TEXT_TAG, "published_line_name"),),
+    TRIAS_NAMESPACE + "DestinationText": ((TEXT_TAG, "destination"),),
+    TRIAS_NAMESPACE + "Mode": ((TRIAS_NAMESPACE + "PtMode", "mode"),),
+    TRIAS_NAMESPACE + "JourneyRef": ((None, "journey_ref"),),
+    TRIAS_NAMESPACE + "OperatingDayRef": ((None, "operating_day"),),
+    TRIAS_NAMESPACE + "Cancelled": ((None, "cancelled"),),
+}
+
+def get_fields(element: ET.Element, field_tags: dict[str, tuple[tuple[str | None, str], ...]], fields: dict[str, str | None]):
+    """Reads the texts of the needed elements in a single walk over an element and its descendants. Only the first one found of every field counts.
+
+    Args:
+        element (ET.Element): The element to walk over
+        field_tags (dict[str, tuple[tuple[str | None, str], ...]]): The needed elements by tag, see CALL_FIELD_TAGS
+        fields (dict[str, str | None]): Texts by field, the texts found are added to it
+    """
+    for descendant in element.iter():
+        for child_tag, field in field_tags.get(descendant.tag, ()):
+            child = descendant if child_tag is None else descendant.find(child_tag)
+            if child is not None and field not in fields:
+                fields[field] = child.text
+
+def read_xml_elements(response: bytes | memoryview, chunk_size: int = 65536):
+    """Feeds the raw response to a pull parser chunk by chunk and yields every element as soon as it is complete. The chunks are views into the response, so it is never copied or decoded as a whole.
 
-def get_departures_for_window(window: "Window", all_departures: list[Departure]):
-    """Returns all departures to be displayed by any one window
+    Args:
+        response (bytes | memoryview): The (encoded) xml document to parse
+        chunk_size (int, optional): Size of the chunks fed to the parser. Defaults to 65536.
+
+    Yields:
+        tuple[str, ET.Element]: Tuples of ("end", element)
+    """
+    view = memoryview(response)
+    parser = ET.XMLPullParser(events=("end",))
+    for offset in range(0, len(view), chunk_size):
+        parser.feed(view[offset:offset + chunk_size])
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+def get_departures_from_xml(stop_point_ref: str,
+                            response: bytes | memoryview, 
+                            station_index: StationIndex, 
+                            line_colors: "LineColors") -> list["Departure"]:
+    """Returns all the departures as Objects in the given xml response from the Trias API. The response is parsed in a single streaming pass that reads the fields of every StopEventResult as soon as it is complete and discards its elements afterwards.
 
     Args:
-        window (Window): Window to find the departures for
-        all_departures (list[Departure]): A list of all departures
+        stop_point_ref (str): StopPointRef the response was requested for
+        response (bytes | memoryview): The raw API response, as returned by the API handler
+        station_index (StationIndex): Index of all stations and their stop points
+        line_colors (LineColors): The line color registry used to color the line icons
 
     Returns:
-        list[Departure]: List of all the departures for this window
-    """    
-    window_departures: list[Departure] = []
+        list[Departure]: A list of all the departures
+    """
+    departures: list[Departure] = []
     
-    # go through all departures
-    for departure in all_departures:
-        # if it's station is the same as the window's station, add it to the list
-        if departure.station == window.station:
-            window_departures.append(departure)
-            
-    return window_departures
+    # get stop_point
+    departure_station, departure_stop_point = station_index.get_stop_point(stop_point_ref)
+    
+    for _, element in read_xml_elements(response):
+        if element.tag != STOP_EVENT_RESULT_TAG:
+            continue
+        
+        # the StopEventResult is complete: read the fields of its departure and discard its elements
+        this_call = element.find(THIS_CALL_PATH)
+        service = element.find(SERVICE_PATH)
+        if this_call is None or service is None:
+            element.clear()
+            continue
+        event_fields: dict[str, str | None] = {}
+        get_fields(this_call, CALL_FIELD_TAGS, event_fields)
+        get_fields(service, SERVICE_FIELD_TAGS, event_fields)
+        element.clear()
+        
+        if not (event_fields.get("stop_point_ref") or "").startswith(stop_point_ref):
+            continue
+        
+        # Get departure times
+        planned_time = datetime.fromisoformat(event_fields["planned_time"])
+        try:
+            estimated_time = datetime.fromisoformat(event_fields["estimated_time"])
+        except Exception:
+            estimated_time = None
+        
+        # Get line name and destination (interned, like all strings repeating across departures, so they share one copy)
+        line_number = intern_text(get_line_number(event_fields["published_line_name"]))
+        destination = intern_text(event_fields["destination"])
+        
+        # platform
+        try:
+            platform = intern_text(format_platform(event_fields["platform"]))
+        except (AttributeError, KeyError):
+            platform = None
+        
+        # mode
+        mode = intern_text(event_fields["mode"])
+
+        # Get colors from github table
+        background_color, text_color = line_colors.get(line_number)
+
+        # Create Departure and add it to the list
+        departures.append(Departure(
+            line_number=line_number,
+            destination=destination,
+            platform=platform,
+            station=departure_station,
+            stop_point=departure_stop_point,
+            mode=mode,
+            background_color=background_color,
+            text_color=text_color,
+            planned_time=planned_time,
+            estimated_time=estimated_time,
+            journey_ref=event_fields.get("journey_ref"),
+            operating_day=intern_text(event_fields.get("operating_day")),
+            cancelled=(event_fields.get("cancelled") or "").strip().lower() == "true"
+        ))
+
+    return departures
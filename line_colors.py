@@ -0,0 +1,212 @@
+import csv
+from dataclasses import dataclass, field
+import hashlib
+import io
+import json
+import os
+import sys
+
+from helper_functions import atomic_write
+from log import logger
+
+@dataclass(frozen=True)
+class LineColorIndex:
+    """Class for the index of all lines of the line color data. An index is never changed after it was built, a reload builds a new one.
+    """
+    colors: dict[str, tuple[str, str]] = field(default_factory=dict) # line name -> (backgroundcolor, textcolor)
+    shapes: dict[str, str] = field(default_factory=dict) # line name -> shape of its line icon
+    
+    def get_hash(self) -> str:
+        """Returns a hash of the index, which changes whenever any line's colors or icon shape change
+
+        Returns:
+            str: hex digest of the hash
+        """
+        return hashlib.sha1(repr((sorted(self.colors.items()), sorted(self.shapes.items()))).encode("utf-8")).hexdigest()
+
+class LineColors:
+    """Class for a line color registry that loads the line color data once and answers lookups from an in-memory index
+    """
+    # Preset colors for superregional train lines, checked by line name prefix before the index is searched
+    presets: list[tuple[str, tuple[str, str]]] = [
+        ("ICE", ("#EC0016", "#FFFFFF")),
+        ("IC", ("#EC0016", "#FFFFFF")),
+        ("FLX", ("#97d700", "#FFFFFF")),
+    ]
+    
+    # Format version of the snapshot, to be increased whenever its content changes
+    snapshot_version: int = 2
+    
+    # Icon shape in the line color data -> shape of the line icons drawn (see gui_line_icons.py), all other shapes are drawn as hexagons
+    icon_shapes: dict[str, str] = {
+        "rectangle-rounded-corner": "rounded",
+        "rectangle": "square",
+        "pill": "banner",
+    }
+
+    def __init__(self,
+                 filename: str,
+                 fallback_colors: tuple[str, str],
+                 SEV_lines_use_normal_line_icon_colors: bool,
+                 operators: tuple[str, ...] = ("kvv",)):
+        """Creates the registry and builds the index from the given file
+
+        Args:
+            filename (str): File location of the line color data
+            fallback_colors (tuple[str, str]): colors to use if a line is not to be found in the data
+            SEV_lines_use_normal_line_icon_colors (bool): whether or not "SEV" lines should use their normal lines colors (see README -> general configuration)
+            operators (tuple[str, ...], optional): Operator names (case insensitive substrings of "shortOperatorName") whose lines are kept (see README -> line colors configuration). Defaults to ("kvv",).
+        """
+        self.filename = filename
+        self.fallback_colors = fallback_colors
+        self.SEV_lines_use_normal_line_icon_colors = SEV_lines_use_normal_line_icon_colors
+        self.operators = [operator.lower() for operator in operators]
+
+        self.index = LineColorIndex()
+        self.reload()
+
+    def _build_index(self) -> LineColorIndex:
+        """Returns the index of all lines of the configured operators, loaded from the snapshot if it is still up to date, else read from the line color data (and saved as the new snapshot)
+
+        Returns:
+            LineColorIndex: The new index
+        """
+        with open(self.filename, "rb") as f:
+            data = f.read()
+        data_hash = hashlib.sha1(data).hexdigest()
+        
+        snapshot = self._load_snapshot(data_hash)
+        if snapshot is not None:
+            return LineColorIndex(*snapshot)
+        
+        colors, shapes = self._read_csv(data.decode("utf-8"))
+        self._save_snapshot(data_hash, colors, shapes)
+        return LineColorIndex(colors, shapes)
+    
+    def _read_csv(self, text: str) -> tuple[dict[str, tuple[str, str]], dict[str, str]]:
+        """Reads the line color data and builds lineName -> colors and lineName -> icon shape indexes of all lines of the configured operators
+
+        Args:
+            text (str): Content of the line color data file
+
+        Returns:
+            tuple[dict[str, tuple[str, str]], dict[str, str]]: dict of line name -> (backgroundcolor, textcolor) and dict of line name -> shape of its line icon
+        """
+        colors: dict[str, tuple[str, str]] = {}
+        shapes: dict[str, str] = {}
+        for row in csv.DictReader(io.StringIO(text)):
+            operator_name = (row["shortOperatorName"] or "").lower()
+            if not any(operator in operator_name for operator in self.operators):
+                continue
+            
+            # keep the first entry of a line name, just like the lookup in the data frame used to
+            colors.setdefault(row["lineName"], (sys.intern(row["backgroundColor"]), sys.intern(row["textColor"])))
+            shapes.setdefault(row["lineName"], self.icon_shapes.get(row.get("shape"), "hexagon"))
+
+        return colors, shapes
+    
+    def _get_snapshot_filename(self) -> str:
+        """Returns the file name of the snapshot of the line color data
+
+        Returns:
+            str: The file name
+        """
+        return os.path.splitext(self.filename)[0] + ".snapshot.json"
+    
+    def _load_snapshot(self, data_hash: str) -> tuple[dict[str, tuple[str, str]], dict[str, str]] | None:
+        """Loads the index from the snapshot, if it was made from the same line color data and for the same operators
+
+        Args:
+            data_hash (str): Hash of the current line color data
+
+        Returns:
+            tuple[dict[str, tuple[str, str]], dict[str, str]] | None: dict of line name -> (backgroundcolor, textcolor) and dict of line name -> shape of its line icon, None if there is no up to date snapshot
+        """
+        try:
+            with open(self._get_snapshot_filename(), "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning(f'Line color snapshot "{self._get_snapshot_filename()}" could not be read, reading the line color data instead', exc_info=True)
+            return None
+        
+        if snapshot.get("version") != self.snapshot_version or snapshot.get("hash") != data_hash or snapshot.get("operators") != self.operators:
+            return None
+        
+        colors = {line_name: (sys.intern(background_color), sys.intern(text_color)) for line_name, (background_color, text_color) in snapshot["colors"].items()}
+        return colors, snapshot["shapes"]
+    
+    def _save_snapshot(self, data_hash: str, colors: dict[str, tuple[str, str]], shapes: dict[str, str]):
+        """Saves the indexes as the snapshot of the line color data
+
+        Args:
+            data_hash (str): Hash of the line color data the indexes were built from
+            colors (dict[str, tuple[str, str]]): dict of line name -> (backgroundcolor, textcolor)
+            shapes (dict[str, str]): dict of line name -> shape of its line icon
+        """
+        filename = self._get_snapshot_filename()
+        snapshot = {
+            "version": self.snapshot_version,
+            "hash": data_hash,
+            "operators": self.operators,
+            "colors": colors,
+            "shapes": shapes,
+        }
+        
+        try:
+            atomic_write(filename, lambda f: f.write(json.dumps(snapshot, separators=(",", ":")).encode("utf-8")))
+        except OSError:
+            logger.warning(f'Line color snapshot "{filename}" could not be saved', exc_info=True)
+
+    def reload(self) -> set[str] | None:
+        """(Re)builds the index from the line color data file. The new index replaces the old one in a single assignment, so lookups never see a half built index.
+
+        Returns:
+            set[str] | None: Names of all lines whose colors or icon shape changed (including added and removed lines), None if the index could not be rebuilt. In that case, the previous index is kept.
+        """
+        try:
+            index = self._build_index()
+        except Exception:
+            logger.exception(f'Line color data "{self.filename}" could not be read, keeping previous line colors')
+            return None
+
+        previous, self.index = self.index, index
+        return {line_name for line_name in previous.colors.keys() | index.colors.keys()
+                if previous.colors.get(line_name) != index.colors.get(line_name) or previous.shapes.get(line_name) != index.shapes.get(line_name)}
+
+    def get_hash(self) -> str:
+        """Returns a hash of the current line color data, which changes whenever any line's colors or icon shape change
+
+        Returns:
+            str: hex digest of the hash
+        """
+        return self.index.get_hash()
+
+    def get(self, line_name: str, index: LineColorIndex | None = None) -> tuple[str, str]:
+        """Returns a tuple of two strings containing color hex codes for background and text color for line icon creation. Sets ICs and ICEs to DB-red color and FLXs to FLX-green color.
+
+        Args:
+            line_name (str): Name of the Line
+            index (LineColorIndex | None, optional): Index to look the line up in, for several lookups in the same index. Defaults to None, which uses the current index.
+
+        Returns:
+            tuple[str, str]: tuple of (backgroundcolor, textcolor) in hex code
+        """
+        # Filter out preset colors for superregional train lines
+        for prefix, preset_colors in self.presets:
+            if line_name.startswith(prefix):
+                return preset_colors
+
+        # take a reference to the current index, so a concurrent reload can't change it in between the lookups
+        colors = (index or self.index).colors
+
+        if line_name in colors:
+            return colors[line_name]
+
+        # Try to search for a SEV's normal line number, if configured to do so
+        if self.SEV_lines_use_normal_line_icon_colors and line_name[0:3] == "SEV" and line_name[3:] in colors:
+            return colors[line_name[3:]]
+
+        # return default colors if no line colors could be found
+        return self.fallback_colors
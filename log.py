@@ -2,5 +2,6 @@ import logging
 import sys
 
 logger = logging.getLogger("KVV-Abfahrtsmonitor")
+logger.setLevel(logging.INFO) # e.g. the startup timeline, other libraries stay at warning level
 logging.basicConfig(format="%(levelname)s:%(asctime)s:%(name)s:%(module)s:%(lineno)s:%(message)s", filename="KVV-Abfahrtsmonitor.log", filemode="w", encoding="utf-8", level=logging.WARNING)
 logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
\ No newline at end of file
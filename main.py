@@ -1,20 +1,27 @@
 #!/usr/bin/env python3
 from log import logger
 
+import argparse
+from datetime import datetime
+import queue
+import threading
 import tkinter as tk
 import tkinter.font as tkfont
-import xml.etree.ElementTree as ET
+
+from startup_timeline import StartupTimeline
+# Record how long each phase of the startup takes
+timeline = StartupTimeline()
 
 from config import Config
-from data_classes import Station, StopPoint, Departure
-from gui import Window
+from data_classes import Station, StopPoint
+from gui import DisplayTicker, Window
 from gui_line_icons import LineIcons
+from gui_qr_code import QRCodes
 from helper_functions import create_stations, \
                              get_all_used_stoppoints, \
                              download_line_color_list, \
-                             get_departures_from_xml, \
-                             get_departures_for_window
-from KVV import KVV
+                             get_icon_warm_up_keys
+# Everything only needed for requesting departures (e.g. requests) is imported after the windows are shown, see below
 #TODO: handle empty departures
 #TODO: handle http errors
 #TODO: popup window for error handling
@@ -30,70 +37,201 @@ from KVV import KVV
 
 logger.info("Starting OpenDepartureDisplay")
 
+# Read the command line arguments
+parser = argparse.ArgumentParser(description="Departure display for stations of the KVV")
+parser.add_argument("--headless", action="store_true", help="render the windows to PNG frames instead of showing them, no matter the render backend configured (see README -> render configuration)")
+args = parser.parse_args()
+
 # Get config from config file and check it for integrity
 config = Config()
+timeline.mark("config loaded")
 
-# Init KVV API handler
-kvv = KVV(url=config.credentials["url"], requestor_ref=config.credentials["requestor_ref"])
+# Render the windows to PNG frames instead of showing them, e.g. without a display server
+headless = args.headless or config.render["backend"] == "headless"
 
-# Init Icon handler
-icons = LineIcons()
+if headless:
+    # Run the scheduled updates in a plain loop instead of Tk's event loop
+    from gui_headless import HeadlessRoot, HeadlessWindow
+    root = HeadlessRoot()
+else:
+    # Init GUI windows
+    root = tk.Tk()
 
-# Init GUI windows
-root = tk.Tk()
+    # Create the default font for use in all windows
+    default_font = tkfont.nametofont("TkDefaultFont")
+    default_font.configure(family="liberation sans", size=60)
+timeline.mark("display initialized")
 
-# Create the default font for use in all windows
-default_font = tkfont.nametofont("TkDefaultFont")
-default_font.configure(family="liberation sans", size=60)
+# Init Icon handler
+icons = LineIcons(max_icons=int(config.icons["max_icons"]), max_bytes=int(config.icons["max_bytes"]))
 
 # Init all windows and stations from config
 stations: dict[Station] = create_stations(config.stations)
-windows: list[Window] = Window.create_windows(config, stations, icons)
+ticker = DisplayTicker(root) # one shared timer for the clocks of all windows
+if headless:
+    windows: list[HeadlessWindow] = HeadlessWindow.create_windows(config, stations, icons, config.render["output_directory"], config.render["save_interval"])
+else:
+    windows: list[Window] = Window.create_windows(config, stations, icons, ticker)
 root.withdraw()
+timeline.mark("windows created")
+
+# Show the window skeletons (header, clock and empty departure entries) right away, everything else is set up while they are visible
+root.update()
+timeline.mark("first frame shown")
+
+# Add the QR-Codes to the headers, all windows share the encoded content and the images of the same size
+qr_codes = QRCodes()
+for window in windows:
+    window.create_qr_code(qr_codes)
+root.update_idletasks()
+timeline.mark("QR codes generated")
+
+from departure_worker import DepartureWorker
+from KVV import KVV, CircuitBreaker
+from line_colors import LineColors
+from refresh_scheduler import RefreshScheduler
+from response_cache import DiskResponseCache, ResponseCache
+from response_capture import ResponseCapture
+from station_index import StationIndex
+
+# Init response capture, if configured
+response_capture = None
+if config.response_capture["enabled"]:
+    response_capture = ResponseCapture(directory=config.response_capture["directory"],
+                                       max_bytes=int(config.response_capture["max_bytes"]),
+                                       backup_count=int(config.response_capture["backup_count"]),
+                                       compress=config.response_capture["compress"])
+
+# Init response cache, if configured
+response_cache = None
+if float(config.api["cache_ttl"]) > 0:
+    if config.api["cache_directory"] is None:
+        response_cache = ResponseCache(ttl=float(config.api["cache_ttl"]), stale_ttl=float(config.api["cache_stale_ttl"]))
+    else:
+        response_cache = DiskResponseCache(config.api["cache_directory"], ttl=float(config.api["cache_ttl"]), stale_ttl=float(config.api["cache_stale_ttl"]))
+
+# Init KVV API handler
+kvv = KVV(url=config.credentials["url"],
+          requestor_ref=config.credentials["requestor_ref"],
+          pool_size=int(config.api["pool_size"]),
+          timeout=(float(config.api["connect_timeout"]), float(config.api["read_timeout"])),
+          max_in_flight=int(config.api["max_concurrent_requests"]),
+          capture=response_capture,
+          cache=response_cache,
+          retries=int(config.api["retries"]),
+          backoff_base=float(config.api["backoff_base"]),
+          backoff_max=float(config.api["backoff_max"]),
+          circuit_breaker=CircuitBreaker(failure_threshold=int(config.api["failure_threshold"]), reset_timeout=float(config.api["reset_timeout"])))
+
+# Init line color registry
+line_colors = LineColors("line-colors.csv", (config.colors["default_icon_background"], config.colors["default_icon_text"]), config.general["SEV-lines use normal line icon colors"], config.line_colors["operators"])
+
+# Index the stations' stop points and windows once, so that departures are routed to them without searching
+station_index = StationIndex(stations, windows)
 
 # Gather a list of all needed stop points, so that if two windoes use the same station the station's stop points don't have to get requested twice from the API
 all_stop_points: list[StopPoint] = get_all_used_stoppoints(windows)
 
+# Init the background worker that fetches and parses the departures off the Tk main thread, requesting each stop point as often as its departures require
+scheduler = RefreshScheduler(min_interval=float(config.refresh["min_interval"]),
+                             max_interval=float(config.refresh["max_interval"]),
+                             imminent_departure=float(config.refresh["imminent_departure"]),
+                             jitter=float(config.refresh["jitter"]),
+                             time_zone=config.general["time_zone"])
+worker = DepartureWorker(kvv, all_stop_points, station_index, line_colors, scheduler)
+timeline.mark("API client ready")
+
+def warm_up_icons(line_names: set[str] | None = None):
+    """Prerender the icons of all lines (or only the given ones) in the background, so that the departures don't have to wait for them
+
+    Args:
+        line_names (set[str] | None, optional): Only prerender the icons of these lines. Defaults to None.
+    """
+    # (re)open the atlas for the current line colors, in the background like the warm up itself
+    if config.icons["atlas_directory"] is not None:
+        icons.open_atlas(config.icons["atlas_directory"], line_colors.get_hash)
+    
+    # headless windows render the icons they show right away, prerendered ones could not be used as there is no Tk to convert them for
+    if config.icons["warm_up"] and not headless:
+        icons.warm_up(get_icon_warm_up_keys(windows, line_colors, icons, line_names))
+
 def update_departure_entries():
-    """Update all departures on all windows
+    """Update all departures on all windows with the newest result of the background worker
     """    
-    # Get the current list of departures from all occuring stations
-    all_departures: list[Departure] = []
-    #tree = ET.parse("response.xml")
+    # Replace the icons of lines whose colors were changed by the background download in the meantime
+    apply_line_color_changes()
     
-    # cycle through all stop points to get their latest departures
-    for stop_point in all_stop_points:
-        # Get the departures for this stoppoint from the KVV API
-        response = kvv.get(stop_point.stop_point_ref, number_of_results=10)
-        try:
-            # Read the API response and add all parsed departures to the list
-            tree = ET.ElementTree(ET.fromstring(response))
-            all_departures.extend(get_departures_from_xml(stop_point.stop_point_ref, tree, stations, (config.colors["default_icon_background"], config.colors["default_icon_text"]), config.general["SEV-lines use normal line icon colors"]))
-        except Exception as e:
-            logger.exception("error in creating departures from xml tree", stack_info=True)
+    # Move the icons prerendered in the meantime into the icon cache, a few at a time
+    if not headless:
+        icons.install_prerendered()
     
-    # Gather a list of all departures for any one window and populate it
-    for window in windows:
-        window_departures = get_departures_for_window(window, all_departures)
-        window.refresh(window_departures)
+    result = worker.get_latest_result()
     
-    # Do it all again after a defined interval
-    # TODO: not hardcoded
-    root.after(30000, update_departure_entries)
+    if result is not None:
+        timeline.mark("first departures fetched")
+        changed_stations = result.changes.get_station_names()
+        
+        # Populate the windows of every station whose departures changed with the station's departures
+        for station in stations:
+            station_departures = result.departures_by_station.get(station.name, ())
+            # if any of the station's stop points could not be updated, show since when its departures are outdated
+            outdated = [result.outdated[stop_point.stop_point_ref] for stop_point in station.stop_points if stop_point.stop_point_ref in result.outdated]
+            outdated_since = min(outdated, default=None)
+            for window in station_index.get_windows(station):
+                if station.name in changed_stations or window.outdated_since != outdated_since:
+                    window.refresh(station_departures, outdated_since)
+        
+        if not timeline.finished:
+            root.update_idletasks()
+            timeline.finish("first departures shown")
+    
+    # Check for new results again after a short time
+    root.after(100, update_departure_entries)
+
+def tick_departures(_: datetime):
+    """Count down the departures shown on all windows between two results of the background worker, without any requests
+    """
+    for window in windows:
+        window.tick()
+
+# Names of the lines whose colors changed, handed from the line color download thread to the Tk thread
+line_color_changes: queue.Queue[set[str]] = queue.Queue()
+
+def download_line_colors():
+    """Download latest line colors for use in line icons and rebuild the color index. Runs in a background thread, so that neither the clocks nor the departures wait for the download.
+    """
+    # Only rebuild the color index and icons if the data actually changed. The new index replaces the old one in a single assignment, so the worker keeps using the old one until then.
+    if download_line_color_list("line-colors.csv") == "updated":
+        changed_lines = line_colors.reload()
+        if changed_lines:
+            line_color_changes.put(changed_lines)
+
+def apply_line_color_changes():
+    """Replace the icons of all lines whose colors were changed by the line color download. Has to be called on the Tk thread.
+    """
+    try:
+        while True:
+            changed_lines = line_color_changes.get_nowait()
+            icons.invalidate_lines(changed_lines) # (Only) remove the icons of lines whose colors changed
+            warm_up_icons(changed_lines)
+    except queue.Empty:
+        pass
 
 def update_data():
-    """Download latest line colors for use in line icons
+    """Start downloading the latest line colors in the background
     """
-    if download_line_color_list("line-colors.csv"):
-        icons.icon_cache.clear() # (Only) clear old icons if new line colors could be downloaded.
+    threading.Thread(target=download_line_colors, name="LineColorDownload", daemon=True).start()
     
     # Do it all again after a defined interval
     # TODO: not hardcoded
-    root.after(300000, update_data) # Update daily: 86400000ms
+    root.after(86400000, update_data) # Update daily
 
-# start refresh cycles
+# start refresh cycles, requesting the first departures right away
+worker.start()
+warm_up_icons()
 update_data()
 update_departure_entries()
+ticker.add_consumer(tick_departures) # Count down every second, right after the clocks
 
 # Run Tk mainloop
 root.mainloop()
\ No newline at end of file
@@ -0,0 +1,112 @@
+from datetime import datetime
+import random
+import threading
+import time
+from zoneinfo import ZoneInfo
+
+from data_classes import Departure
+
+class RefreshScheduler:
+    """Class for a scheduler that decides when each stop point is requested again, based on how close its next departure is: often while a departure is imminent, rarely while the next one is far away (e.g. at night)
+    """
+    def __init__(self,
+                 min_interval: float = 30,
+                 max_interval: float = 600,
+                 imminent_departure: float = 120,
+                 jitter: float = 0.1,
+                 time_zone: str = "Europe/Berlin"):
+        """Creates the scheduler. Every stop point is due right away until it was scheduled for the first time.
+
+        Args:
+            min_interval (float, optional): Minimum seconds between two requests of a stop point. Defaults to 30.
+            max_interval (float, optional): Maximum seconds between two requests of a stop point. Defaults to 600.
+            imminent_departure (float, optional): Stop points with a departure within this many seconds are requested every min_interval seconds. Defaults to 120.
+            jitter (float, optional): Intervals are randomly varied by up to this fraction, so that the requests of several stop points spread out over time. Defaults to 0.1.
+            time_zone (str, optional): The applicable timezone, the same the windows count down the departures in. Defaults to "Europe/Berlin".
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.imminent_departure = imminent_departure
+        self.jitter = jitter
+        self.time_zone = time_zone
+
+        # stop_point_ref -> time.monotonic() at which it is due next
+        self._lock = threading.Lock()
+        self._next_due: dict[str, float] = {}
+
+    def get_interval(self, departures: list[Departure], now: datetime) -> float:
+        """Returns the seconds until a stop point with the given departures should be requested again (without jitter)
+
+        Args:
+            departures (list[Departure]): The stop point's latest departures
+            now (datetime): The current (time zone aware) time
+
+        Returns:
+            float: Seconds until the next request
+        """
+        upcoming = [departure.effective_time - now for departure in departures]
+        upcoming = [time_left.total_seconds() for time_left in upcoming if time_left.total_seconds() >= 0]
+
+        # without any known departure there is nothing to keep fresh
+        if len(upcoming) == 0:
+            return self.max_interval
+
+        seconds_to_next = min(upcoming)
+        if seconds_to_next <= self.imminent_departure:
+            return self.min_interval
+
+        # request again halfway to the next departure, so that delays announced in the meantime still show up in time
+        return min(max(seconds_to_next / 2, self.min_interval), self.max_interval)
+
+    def schedule(self, stop_point_ref: str, departures: list[Departure] | None):
+        """Schedules the next request of a stop point
+
+        Args:
+            stop_point_ref (str): StopPointRef to schedule
+            departures (list[Departure] | None): The stop point's latest departures, None if the request failed
+        """
+        if departures is None:
+            # try again soon after a failed request
+            interval = self.min_interval
+        else:
+            interval = self.get_interval(departures, datetime.now().replace(tzinfo=ZoneInfo(self.time_zone)))
+
+        interval *= 1 + random.uniform(-self.jitter, self.jitter)
+        with self._lock:
+            self._next_due[stop_point_ref] = time.monotonic() + interval
+
+    def get_due(self, stop_point_refs: list[str]) -> list[str]:
+        """Returns all stop points that are due to be requested
+
+        Args:
+            stop_point_refs (list[str]): All StopPointRefs
+
+        Returns:
+            list[str]: The StopPointRefs that are due
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [stop_point_ref for stop_point_ref in stop_point_refs if self._next_due.get(stop_point_ref, now) <= now]
+
+    def get_seconds_until_due(self, stop_point_refs: list[str]) -> float:
+        """Returns the seconds until the next of the stop points is due
+
+        Args:
+            stop_point_refs (list[str]): All StopPointRefs
+
+        Returns:
+            float: Seconds until the next stop point is due, 0 if one already is
+        """
+        now = time.monotonic()
+        with self._lock:
+            next_due = min((self._next_due.get(stop_point_ref, now) for stop_point_ref in stop_point_refs), default=now + self.max_interval)
+        return max(next_due - now, 0)
+
+    def make_due(self, stop_point_ref: str):
+        """Makes a stop point due right away
+
+        Args:
+            stop_point_ref (str): StopPointRef to make due
+        """
+        with self._lock:
+            self._next_due.pop(stop_point_ref, None)
@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+from datetime import timedelta
+import hashlib
+import os
+import threading
+import time
+
+from helper_functions import atomic_write
+from log import logger
+
+# (stop_point_ref, number_of_results, time_delta) of a request
+CacheKey = tuple[str, int, timedelta]
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """Class for one cached API response
+    """
+    response: bytes
+    fetched: float # unix timestamp of when the response was received
+
+class ResponseCache:
+    """Class for an in-memory API response cache with a time to live and stale-while-revalidate semantics. Subclass it and override load and store for other storages.
+    """
+    def __init__(self, ttl: float, stale_ttl: float = 0, report_interval: float = 3600):
+        """Creates an empty cache
+
+        Args:
+            ttl (float): Seconds a response is fresh and answered from the cache without a new request
+            stale_ttl (float, optional): Seconds after the ttl a stale response is still answered from the cache while it is refreshed in the background. Defaults to 0.
+            report_interval (float, optional): Seconds between two log entries of the statistics. Defaults to 3600.
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.report_interval = report_interval
+
+        # statistics about the lookups made
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._last_report = time.monotonic()
+
+        self._lock = threading.Lock()
+        self._entries: dict[CacheKey, CacheEntry] = {}
+
+    def load(self, key: CacheKey) -> CacheEntry | None:
+        """Returns the entry stored for a key
+
+        Args:
+            key (CacheKey): The key of the request
+
+        Returns:
+            CacheEntry | None: The entry, None if there is none
+        """
+        with self._lock:
+            return self._entries.get(key)
+
+    def store(self, key: CacheKey, entry: CacheEntry):
+        """Stores an entry for a key, replacing the previous one
+
+        Args:
+            key (CacheKey): The key of the request
+            entry (CacheEntry): The entry to store
+        """
+        with self._lock:
+            self._entries[key] = entry
+
+    def lookup(self, key: CacheKey) -> tuple[CacheEntry | None, bool]:
+        """Looks up a key and counts the result as hit, stale hit or miss
+
+        Args:
+            key (CacheKey): The key of the request
+
+        Returns:
+            tuple[CacheEntry | None, bool]: The usable entry (None on a miss) and whether it is stale and should be refreshed
+        """
+        entry = self.load(key)
+        age = time.time() - entry.fetched if entry is not None else None
+
+        with self._lock:
+            self._report()
+            if age is not None and age < self.ttl:
+                self.hits += 1
+                return entry, False
+            if age is not None and age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                return entry, True
+            self.misses += 1
+            return None, False
+
+    def _report(self):
+        """Logs the statistics, if the report interval has passed since the last report. Has to be called with the lock held.
+        """
+        now = time.monotonic()
+        if now - self._last_report < self.report_interval:
+            return
+        
+        logger.info(f"response cache: {self.hits} hits, {self.stale_hits} stale hits, {self.misses} misses since start")
+        self._last_report = now
+
+class DiskResponseCache(ResponseCache):
+    """Class for an API response cache that additionally keeps its responses on disk, so that they survive restarts
+    """
+    def __init__(self, directory: str, ttl: float, stale_ttl: float = 0, report_interval: float = 3600):
+        """Creates the cache. Responses already on disk are loaded when they are first looked up.
+
+        Args:
+            directory (str): Directory the responses are kept in
+            ttl (float): Seconds a response is fresh and answered from the cache without a new request
+            stale_ttl (float, optional): Seconds after the ttl a stale response is still answered from the cache while it is refreshed in the background. Defaults to 0.
+            report_interval (float, optional): Seconds between two log entries of the statistics. Defaults to 3600.
+        """
+        super().__init__(ttl, stale_ttl, report_interval)
+        self.directory = directory
+
+    def _get_filename(self, key: CacheKey) -> str:
+        """Returns the file name a key's response is kept in
+
+        Args:
+            key (CacheKey): The key of the request
+
+        Returns:
+            str: The file name
+        """
+        stop_point_ref, number_of_results, time_delta = key
+        digest = hashlib.sha1(f"{stop_point_ref}|{number_of_results}|{time_delta.total_seconds()}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".xml")
+
+    def load(self, key: CacheKey) -> CacheEntry | None:
+        entry = super().load(key)
+        if entry is not None:
+            return entry
+
+        # fall back to the disk, the file's modification time is the time the response was received
+        filename = self._get_filename(key)
+        try:
+            with open(filename, "rb") as f:
+                entry = CacheEntry(response=f.read(), fetched=os.path.getmtime(filename))
+        except FileNotFoundError:
+            return None
+        except OSError:
+            logger.exception(f"Cached response {filename} could not be read")
+            return None
+
+        super().store(key, entry)
+        return entry
+
+    def store(self, key: CacheKey, entry: CacheEntry):
+        super().store(key, entry)
+
+        filename = self._get_filename(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            atomic_write(filename, lambda f: f.write(entry.response))
+            os.utime(filename, (entry.fetched, entry.fetched))
+        except OSError:
+            logger.exception(f"Response could not be cached to {filename}")
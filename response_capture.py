@@ -0,0 +1,104 @@
+import gzip
+import os
+import queue
+import re
+import threading
+
+from helper_functions import atomic_write
+from log import logger
+
+class ResponseCapture:
+    """Class for capturing API responses to disk for debugging and replay. Responses are written by a background thread, so that the requests never wait for the (e.g. SD card) file system.
+    """
+    def __init__(self,
+                 directory: str = "responses",
+                 max_bytes: int = 5000000,
+                 backup_count: int = 5,
+                 compress: bool = False,
+                 queue_size: int = 100):
+        """Creates the capture facility and starts its writer thread
+
+        Args:
+            directory (str, optional): Directory to write the responses to. Defaults to "responses".
+            max_bytes (int, optional): Maximum number of bytes all files of one stop point may take up. The oldest backups are deleted first. Defaults to 5000000.
+            backup_count (int, optional): Number of previous responses kept per stop point in addition to the latest one. Defaults to 5.
+            compress (bool, optional): Whether the responses are gzip compressed. Defaults to False.
+            queue_size (int, optional): Maximum number of responses waiting to be written. Further responses are dropped. Defaults to 100.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.extension = ".xml.gz" if compress else ".xml"
+
+        self.dropped = 0
+        self._queue: queue.Queue[tuple[str, bytes]] = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="ResponseCapture", daemon=True)
+        self._thread.start()
+
+    def capture(self, stop_point_ref: str, response: bytes):
+        """Hands a response over to the writer thread without blocking
+
+        Args:
+            stop_point_ref (str): StopPointRef the response was requested for
+            response (bytes): The raw API response
+        """
+        try:
+            self._queue.put_nowait((stop_point_ref, response))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Response capture can't keep up, dropped response of stop point {stop_point_ref}")
+
+    def _get_filename(self, stop_point_ref: str, index: int = 0) -> str:
+        """Returns the file name of a stop point's captured response
+
+        Args:
+            stop_point_ref (str): StopPointRef of the response
+            index (int, optional): 0 for the latest response, 1 to backup_count for the previous ones. Defaults to 0.
+
+        Returns:
+            str: The file name
+        """
+        # StopPointRefs contain colons, which are not allowed in file names everywhere
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", stop_point_ref)
+        if index > 0:
+            name += f".{index}"
+        return os.path.join(self.directory, name + self.extension)
+
+    def _run(self):
+        """Writer thread loop: write every response handed over
+        """
+        while True:
+            stop_point_ref, response = self._queue.get()
+            try:
+                self._write(stop_point_ref, response)
+            except Exception:
+                logger.exception(f"Response of stop point {stop_point_ref} could not be captured")
+
+    def _write(self, stop_point_ref: str, response: bytes):
+        """Rotates the stop point's files and writes the response as its latest one
+
+        Args:
+            stop_point_ref (str): StopPointRef the response was requested for
+            response (bytes): The raw API response
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        # shift the previous responses by one, dropping the oldest one
+        for index in range(self.backup_count, 0, -1):
+            source = self._get_filename(stop_point_ref, index - 1)
+            if os.path.exists(source):
+                os.replace(source, self._get_filename(stop_point_ref, index))
+
+        data = gzip.compress(response) if self.compress else response
+        atomic_write(self._get_filename(stop_point_ref), lambda f: f.write(data))
+
+        # delete the oldest backups while all files of this stop point take up more than max_bytes
+        total_size = 0
+        for index in range(self.backup_count + 1):
+            backup = self._get_filename(stop_point_ref, index)
+            if not os.path.exists(backup):
+                continue
+            total_size += os.path.getsize(backup)
+            if index > 0 and total_size > self.max_bytes:
+                os.remove(backup)
@@ -0,0 +1,43 @@
+import time
+
+from log import logger
+
+class StartupTimeline:
+    """Class for recording how long each phase of the startup takes and emitting the timeline to the log
+    """
+    def __init__(self):
+        """Starts the timeline
+        """
+        self.start = time.perf_counter()
+        self.last = self.start
+        
+        # (phase, seconds since start, seconds the phase took)
+        self.phases: list[tuple[str, float, float]] = []
+        self.finished = False
+    
+    def mark(self, phase: str):
+        """Marks the end of a phase
+
+        Args:
+            phase (str): Name of the phase that just ended
+        """
+        if self.finished:
+            return
+        
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.start, now - self.last))
+        self.last = now
+        logger.info(f"startup: {phase} after {(now - self.start) * 1000:.0f} ms (+{self.phases[-1][2] * 1000:.0f} ms)")
+    
+    def finish(self, phase: str):
+        """Marks the end of the last phase and logs the whole timeline. Later marks are ignored.
+
+        Args:
+            phase (str): Name of the last phase
+        """
+        if self.finished:
+            return
+        
+        self.mark(phase)
+        self.finished = True
+        logger.info("startup timeline: " + ", ".join(f"{phase} {duration * 1000:.0f} ms" for phase, _, duration in self.phases) + f", total {self.phases[-1][1] * 1000:.0f} ms")
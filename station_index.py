@@ -0,0 +1,71 @@
+import heapq
+from operator import attrgetter
+from typing import TYPE_CHECKING
+# Only for typechecking to prevent a circular import but still be able to use the Window type setting
+if TYPE_CHECKING:
+    from gui import Window
+from data_classes import Station, StopPoint, Departure
+
+class StationIndex:
+    """Class for an index built once from the config, that routes stop points to their station and stations to their windows without searching
+    """
+    def __init__(self, stations: list[Station], windows: list["Window"] | None = None):
+        """Builds the index
+
+        Args:
+            stations (list[Station]): All stations
+            windows (list[Window] | None, optional): All windows, None for none. Defaults to None.
+        """
+        # stop_point_ref -> (station, stop point)
+        self.stop_points: dict[str, tuple[Station, StopPoint]] = {}
+        for station in stations:
+            for stop_point in station.stop_points:
+                self.stop_points[stop_point.stop_point_ref] = (station, stop_point)
+
+        # station name -> all windows showing that station
+        self.windows_by_station: dict[str, list["Window"]] = {}
+        for window in windows or []:
+            self.windows_by_station.setdefault(window.station.name, []).append(window)
+
+    def get_stop_point(self, stop_point_ref: str) -> tuple[Station, StopPoint]:
+        """Returns the stop point of a StopPointRef and the station it belongs to
+
+        Args:
+            stop_point_ref (str): The StopPointRef
+
+        Raises:
+            KeyError: If the stop point is not in any station
+
+        Returns:
+            tuple[Station, StopPoint]: Tuple of (station, stop point)
+        """
+        return self.stop_points[stop_point_ref]
+
+    def get_windows(self, station: Station) -> list["Window"]:
+        """Returns all windows showing a station
+
+        Args:
+            station (Station): The station
+
+        Returns:
+            list[Window]: The windows, empty if the station isn't shown anywhere
+        """
+        return self.windows_by_station.get(station.name, [])
+
+    @staticmethod
+    def bucket_by_station(departures_by_stop_point: dict[str, list[Departure]]) -> dict[str, tuple[Departure, ...]]:
+        """Groups the departures of all stop points by the station they belong to. The stop points' departures have to be ordered by their effective time already; they are merged, so every station's departures are ordered as well.
+
+        Args:
+            departures_by_stop_point (dict[str, list[Departure]]): Departures by StopPointRef, each ordered by their effective time
+
+        Returns:
+            dict[str, tuple[Departure, ...]]: Departures by station name, ordered by their effective time
+        """
+        streams: dict[str, list[list[Departure]]] = {}
+        for departures in departures_by_stop_point.values():
+            if len(departures) > 0:
+                # all departures of a stop point belong to the same station
+                streams.setdefault(departures[0].station.name, []).append(departures)
+
+        return {station_name: tuple(heapq.merge(*station_streams, key=attrgetter("effective_time"))) for station_name, station_streams in streams.items()}